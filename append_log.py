@@ -0,0 +1,193 @@
+"""Append-only storage for the high-write COS tables.
+
+New rows are written as small immutable CSV objects under
+``<prefix><YYYY-MM-DD>/`` instead of rewriting the whole table, so a
+submission costs one small PUT and concurrent writers never overwrite each
+other. Readers see the canonical base CSV plus every shard not yet merged
+into it. ``compact()`` folds the shards into the base object and deletes
+them; it is idempotent and rows duplicated across base and shards (while a
+compaction is in flight) are dropped on read.
+
+``read_base`` must raise when the base cannot be read (a missing base is
+an empty table). ``read`` then falls back to the last base it read, and
+``compact`` aborts without touching the base or the shards, since writing
+the shard rows alone would replace the table.
+
+COS has no conditional writes, so two compactions that overlap would each
+write back the base they read and the later one could drop rows merged by
+the other. ``compact`` therefore holds an exclusive lock on ``lock_path``
+(covering every worker and ``flask compact-logs`` on the node) and reads
+the base with ``fetch_base``, which must bypass any cache; only one node
+may compact a bucket.
+"""
+import fcntl
+import io
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import pandas as pd
+
+
+class AppendLog:
+
+    def __init__(self, get_client, bucket, base_key, prefix, read_base, write_base, ttl=0,
+                 fetch_base=None, lock_path=None):
+        self._get_client = get_client
+        self.bucket = bucket
+        self.base_key = base_key
+        self.prefix = prefix
+        self._read_base = read_base
+        self._write_base = write_base
+        self._fetch_base = fetch_base or read_base
+        self.lock_path = lock_path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._shards = {}
+        self._listed = None
+        self._listed_at = 0
+        self._appended = {}
+        self._merged = None
+        self._merged_base = None
+        self._merged_keys = None
+
+    def _list_shards(self):
+        keys = []
+        token = None
+        while True:
+            params = {"Bucket": self.bucket, "Prefix": self.prefix}
+            if token:
+                params["ContinuationToken"] = token
+            response = self._get_client().list_objects_v2(**params)
+            keys.extend(obj["Key"] for obj in response.get("Contents", []))
+            if not response.get("IsTruncated"):
+                break
+            token = response["NextContinuationToken"]
+        return sorted(keys)
+
+    def _fetch_shard(self, key):
+        response = self._get_client().get_object(Bucket=self.bucket, Key=key)
+        return pd.read_csv(io.BytesIO(response["Body"].read()))
+
+    def _load_shards(self, keys):
+        """Fetch the shards of ``keys`` not held yet, without holding the lock."""
+        with self._lock:
+            held = {key: self._shards[key] for key in keys if key in self._shards}
+        loaded = {key: self._fetch_shard(key) for key in keys if key not in held}
+        with self._lock:
+            if self._listed is not None:
+                # Not re-added after a compaction here dropped them.
+                self._shards.update(loaded)
+        return held | loaded
+
+    @staticmethod
+    def _merge(base, shards):
+        frames = [f for f in [base, *shards] if not f.empty]
+        if not frames:
+            return base
+        return pd.concat(frames, ignore_index=True).drop_duplicates(ignore_index=True)
+
+    def read(self, strict=False):
+        """Return base + unmerged shards. The same DataFrame object is
+        returned for as long as neither the base nor the shard set changes.
+        ``strict`` raises read and listing errors instead of falling back,
+        and always lists the shards. COS is only called outside the lock."""
+        try:
+            base = self._read_base()
+        except Exception as e:
+            if strict:
+                raise
+            print(f"⚠️ Error reading {self.base_key}: {e}")
+            with self._lock:
+                base = self._merged_base if self._merged_base is not None else pd.DataFrame()
+        with self._lock:
+            keys = self._listed
+            due = strict or keys is None or time.monotonic() - self._listed_at >= self.ttl
+        if due:
+            started = time.monotonic()
+            try:
+                listed = self._list_shards()
+            except Exception as e:
+                if strict:
+                    raise
+                print(f"⚠️ Error listing {self.prefix}: {e}")
+                listed = None
+            with self._lock:
+                if listed is not None:
+                    # Shards this process wrote after the listing began may be missing from it.
+                    self._appended = {k: t for k, t in self._appended.items() if t >= started}
+                    self._listed = sorted(set(listed) | self._appended.keys())
+                    self._listed_at = time.monotonic()
+                keys = self._listed = self._listed or []
+        keys = tuple(keys)
+        shards = self._load_shards(keys)
+        with self._lock:
+            if self._merged is None or base is not self._merged_base or keys != self._merged_keys:
+                self._merged = self._merge(base, [shards[key] for key in keys])
+                self._merged_base = base
+                self._merged_keys = keys
+            return self._merged
+
+    def append(self, record):
+        """Write ``record`` as a new shard and return the updated table."""
+        return self.append_many([record])
+
+    def append_many(self, records):
+        """Write ``records`` as a single shard and return the updated table."""
+        buffer = io.StringIO()
+        pd.DataFrame(records).to_csv(buffer, index=False)
+        body = buffer.getvalue()
+
+        current = self.read()
+        now = datetime.now()
+        key = f"{self.prefix}{now:%Y-%m-%d}/{time.time_ns()}-{uuid.uuid4().hex[:8]}.csv"
+        self._get_client().put_object(Bucket=self.bucket, Key=key, Body=body)
+
+        shard = pd.read_csv(io.StringIO(body))
+        with self._lock:
+            self._shards[key] = shard
+            self._appended[key] = time.monotonic()
+            self._listed = sorted((self._listed or []) + [key])
+            if current.empty:
+                merged = shard
+            else:
+                merged = pd.concat([current, shard], ignore_index=True)
+            self._merged = merged
+            self._merged_keys = tuple(self._listed)
+            return merged
+
+    def compact(self):
+        """Merge every shard into the base object, then delete the shards.
+        Returns the number of shards merged. Raises, leaving everything in
+        place, if the base or a shard cannot be read or another compaction
+        on this node holds the lock."""
+        lock_file = open(self.lock_path, "a") if self.lock_path else None
+        try:
+            if lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    raise RuntimeError(f"another compaction of {self.base_key} is running")
+            return self._compact()
+        finally:
+            if lock_file:
+                lock_file.close()
+
+    def _compact(self):
+        keys = self._list_shards()
+        if not keys:
+            return 0
+        base = self._fetch_base()
+        shards = self._load_shards(keys)
+        self._write_base(self._merge(base, [shards[key] for key in keys]))
+        client = self._get_client()
+        for key in keys:
+            client.delete_object(Bucket=self.bucket, Key=key)
+        with self._lock:
+            for key in keys:
+                self._shards.pop(key, None)
+                self._appended.pop(key, None)
+            self._listed = None
+            self._merged = None
+        return len(keys)
@@ -0,0 +1,71 @@
+"""Per-slip render time and allocation for the payslip PDF.
+
+"before" reproduces the old per-request path: a fresh ImageReader and
+TableStyle for every slip, the logo encoded by Canvas.drawImage, streams
+written as ASCII85 text, and the PDF written to salary_slips/ and read back for upload. "after" is the
+cached PayslipTemplate rendering into memory.
+
+    python benchmarks/bench_payslip_render.py --slips 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from reportlab import rl_config  # noqa: E402
+from payslips import PayslipTemplate, build_slip, render_payslip_buffer  # noqa: E402
+
+
+def render_before(slip, folder):
+    template = PayslipTemplate()
+    template._logo_jpeg = None
+    path = os.path.join(folder, f"{slip['emp_id']}.pdf")
+    rl_config.useA85 = 1
+    try:
+        template.render(slip, path)
+    finally:
+        rl_config.useA85 = 0
+    with open(path, "rb") as f:
+        body = f.read()
+    os.remove(path)
+    return body
+
+
+def render_after(slip, folder):
+    return render_payslip_buffer(slip).getvalue()
+
+
+def measure(render, slips, folder):
+    render(slips[0], folder)
+    start = time.perf_counter()
+    for slip in slips:
+        render(slip, folder)
+    elapsed = (time.perf_counter() - start) / len(slips)
+
+    tracemalloc.start()
+    render(slips[0], folder)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed * 1000, peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--slips", type=int, default=200)
+    args = parser.parse_args()
+
+    slips = [build_slip(f"SP{i:05d}", f"EP{i:05d}", f"Employee {i}", 50_000 + i, date.today())
+             for i in range(args.slips)]
+    with tempfile.TemporaryDirectory() as folder:
+        print(f"{'variant':<8}{'ms/slip':>10}{'peak KiB':>10}")
+        for name, render in (("before", render_before), ("after", render_after)):
+            ms, peak = measure(render, slips, folder)
+            print(f"{name:<8}{ms:>10.2f}{peak:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""Load test for the Flask routes against a seeded local COS.
+
+Each scale runs in a fresh process: the app is imported with
+COS_BACKEND=local pointing at a temporary directory, the four tables are
+seeded with ``rows`` synthetic rows each (applicants skewed towards a few
+popular jobs), and every route is driven by ``--concurrency`` threads with
+their own test client. Reports throughput, latency percentiles, error
+counts and process memory per scale.
+
+    python benchmarks/bench_routes.py --scales 100,10000,100000 --requests 200 --concurrency 8
+    python benchmarks/bench_routes.py --scales 1000 --cos-latency 0.02 --json results.json
+
+Requests go through the WSGI test client, so the numbers are app cost plus
+the simulated COS latency, without network or server overhead.
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+ROUTES = ["index", "job_detail", "apply", "applicants", "employee", "generate_payslip"]
+DEPARTMENTS = ["IT", "HR", "Finance", "Sales", "Operations"]
+LOCATIONS = ["Hyderabad", "Bangalore", "Chennai", "Pune", "Remote"]
+SKILLS = ["Python", "SQL", "Machine Learning", "React", "Docker", "Watson", "Power BI", "Spark"]
+
+
+def synthetic_tables(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    jobs = rows
+    job_ids = np.array([f"JD{i:06d}" for i in range(1, jobs + 1)])
+    days = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 600, rows), unit="D")
+
+    descriptions = [
+        f"Job Title: Engineer {i}\\n\\nSummary:\\nBuild and run data systems for our clients.\\n\\n"
+        f"Responsibilities:\\n- Design pipelines\\n- Review code\\n\\n"
+        f"Required Skills:\\n- {SKILLS[i % len(SKILLS)]}\\n- {SKILLS[(i * 3) % len(SKILLS)]}\\n\\n"
+        f"Experience Range: {i % 10}-{i % 10 + 3} years\\n\\nJob Location: {LOCATIONS[i % len(LOCATIONS)]}"
+        for i in range(jobs)
+    ]
+    applicant_jobs = job_ids[(rng.zipf(1.3, rows) - 1) % jobs]
+    emp_ids = np.array([f"EP{i:06d}" for i in range(1, rows + 1)])
+
+    return {
+        "jobs": pd.DataFrame({
+            "job_id": job_ids,
+            "job_description": descriptions,
+            "job_date": days.strftime("%d-%m-%Y"),
+        }),
+        "forms": pd.DataFrame({
+            "form_id": [f"FM{i:07d}" for i in range(1, rows + 1)],
+            "job_id": applicant_jobs,
+            "name": [f"Applicant {i}" for i in range(rows)],
+            "email": [f"applicant{i}@example.com" for i in range(rows)],
+            "phone_number": rng.integers(7_000_000_000, 9_999_999_999, rows),
+            "resume": [f"resume_{i}.pdf" for i in range(rows)],
+            "form_date": days.strftime("%Y-%m-%d"),
+        }),
+        "employees": pd.DataFrame({
+            "emp_id": emp_ids,
+            "employee_name": [f"Employee {i}" for i in range(rows)],
+            "email_id": [f"employee{i}@example.com" for i in range(rows)],
+            "department": [DEPARTMENTS[i % len(DEPARTMENTS)] for i in range(rows)],
+            "date_of_joining": days.strftime("%Y-%m-%d"),
+        }),
+        "slips": pd.DataFrame({
+            "slip_id": [f"SP{i:07d}" for i in range(1, rows + 1)],
+            "emp_id": emp_ids[rng.integers(0, rows, rows)],
+            "gross_salary": rng.integers(30_000, 200_000, rows).astype(float),
+            "tax": 0.0,
+            "pf": 0.0,
+            "net_salary": 0.0,
+            "slip_date": days.strftime("%Y-%m-%d"),
+        }),
+    }
+
+
+def resume_pdf():
+    from reportlab.pdfgen import canvas
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    pdf.drawString(72, 720, "Python developer with 4 years of SQL, Docker and Machine Learning experience.")
+    pdf.save()
+    return buffer.getvalue()
+
+
+def request_for(route, rng, tables, resume):
+    """A callable issuing one request for ``route`` on a test client."""
+    if route == "index":
+        return lambda client: client.get("/")
+    if route == "job_detail":
+        job_id = tables["jobs"]["job_id"].iat[rng.integers(len(tables["jobs"]))]
+        return lambda client: client.get(f"/job/{job_id}")
+    if route == "applicants":
+        # Skewed like the seeded forms: mostly the popular jobs.
+        job_id = tables["forms"]["job_id"].iat[rng.integers(len(tables["forms"]))]
+        return lambda client: client.get(f"/api/applicants/{job_id}")
+    if route == "employee":
+        emp_id = tables["employees"]["emp_id"].iat[rng.integers(len(tables["employees"]))]
+        return lambda client: client.post("/api/employee", json={"emp_id": emp_id})
+    if route == "generate_payslip":
+        emp_id = tables["employees"]["emp_id"].iat[rng.integers(len(tables["employees"]))]
+        return lambda client: client.post("/generate-payslip", json={"emp_id": emp_id, "gross_salary": 60000})
+    if route == "apply":
+        job_id = tables["jobs"]["job_id"].iat[rng.integers(len(tables["jobs"]))]
+        n = int(rng.integers(1_000_000))
+        return lambda client: client.post("/apply", content_type="multipart/form-data", data={
+            "job_id": job_id, "name": f"Load {n}", "email": f"load{n}@example.com", "phone_number": "9000000000",
+            "resume": (io.BytesIO(resume), f"load_{n}.pdf"),
+        })
+    raise ValueError(route)
+
+
+def percentile(values, q):
+    return values[int(q * (len(values) - 1))] if values else None
+
+
+def rss_mib():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return None
+
+
+def drive(app, requests, concurrency):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    pending = iter(requests)
+
+    def worker():
+        nonlocal errors
+        client = app.test_client()
+        while True:
+            with lock:
+                issue = next(pending, None)
+            if issue is None:
+                return
+            started = time.perf_counter()
+            response = issue(client)
+            response.get_data()
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                errors += response.status_code >= 400
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / wall if wall else None,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def run_scale(args):
+    workdir = tempfile.mkdtemp(prefix="bench-routes-")
+    os.environ.update({
+        "COS_BACKEND": "local",
+        "COS_LOCAL_DIR": os.path.join(workdir, "cos"),
+        "COS_LOCAL_LATENCY": str(args.cos_latency),
+        "COS_BUCKET_NAME": "bench",
+        "ID_SEQUENCE_DB": os.path.join(workdir, "sequences.db"),
+        "TASK_QUEUE_DB": os.path.join(workdir, "tasks.db"),
+    })
+    if args.cache_ttl is not None:
+        os.environ["TABLE_CACHE_TTL"] = str(args.cache_ttl)
+    sys.path.insert(0, ROOT)
+    os.chdir(workdir)
+    import main  # noqa: E402
+
+    tables = synthetic_tables(args.rows, args.seed)
+    started = time.perf_counter()
+    main.save_jobs_df(tables["jobs"])
+    main.save_forms_df(tables["forms"])
+    main.save_employee_df(tables["employees"])
+    main.save_slips_df(tables["slips"])
+    result = {"rows": args.rows, "seed_s": time.perf_counter() - started, "routes": {}}
+
+    rng = np.random.default_rng(args.seed + 1)
+    resume = resume_pdf()
+    routes = args.routes.split(",") if args.routes else ROUTES
+    client = main.app.test_client()
+    for route in routes:
+        request_for(route, rng, tables, resume)(client).get_data()
+    result["rss_after_warmup_mib"] = rss_mib()
+
+    for route in routes:
+        requests = [request_for(route, rng, tables, resume) for _ in range(args.requests)]
+        result["routes"][route] = drive(main.app, requests, args.concurrency)
+
+    result["rss_mib"] = rss_mib()
+    result["peak_rss_mib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    # Let the resume ingestion queued by /apply finish before the workdir goes
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        tasks = main.task_queue.snapshot()
+        if not tasks["queued"] and not tasks["running"]:
+            break
+        time.sleep(0.1)
+    shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def report(results):
+    print(f"{'rows':>9} {'route':<18}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for result in results:
+        for route, stats in result["routes"].items():
+            print(f"{result['rows']:>9} {route:<18}{stats['throughput']:>9.1f}{stats['p50_ms']:>9.2f}"
+                  f"{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}{stats['errors']:>8}")
+        print(f"{result['rows']:>9} seeded in {result['seed_s']:.1f}s, RSS {result['rss_mib']:.0f} MiB "
+              f"(peak {result['peak_rss_mib']:.0f} MiB)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", default="100,10000", help="comma-separated row counts per table")
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--routes", default=None, help=f"subset of {','.join(ROUTES)}")
+    parser.add_argument("--cos-latency", type=float, default=0.0, help="seconds added to every COS call")
+    parser.add_argument("--cache-ttl", type=float, default=None, help="TABLE_CACHE_TTL for the app")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    parser.add_argument("--rows", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.rows is not None:
+        # Worker: one scale, result as the last line of stdout.
+        print(json.dumps(run_scale(args)))
+        return
+
+    results = []
+    for rows in (int(s) for s in args.scales.split(",")):
+        command = [sys.executable, os.path.abspath(__file__), "--rows", str(rows),
+                   "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+                   "--cos-latency", str(args.cos_latency), "--seed", str(args.seed)]
+        if args.routes:
+            command += ["--routes", args.routes]
+        if args.cache_ttl is not None:
+            command += ["--cache-ttl", str(args.cache_ttl)]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(completed.stderr, file=sys.stderr)
+            sys.exit(f"scale {rows} failed")
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
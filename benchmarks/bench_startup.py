@@ -0,0 +1,111 @@
+"""Import time and per-worker memory of the app.
+
+"import" runs ``import main`` in fresh interpreters and reports the wall
+time, RSS and which heavy libraries were loaded. "workers" starts
+``--workers`` processes the way gunicorn does, with and without
+preloading the app in the parent, serves one request to / in each, and
+reports each worker's RSS and private (unshared) memory.
+
+    python benchmarks/bench_startup.py --runs 5 --workers 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+HEAVY = ["pandas", "reportlab", "scipy", "spacy", "fpdf", "ibm_boto3", "ibm_botocore", "pyarrow", "pypdf"]
+
+PROBE = textwrap.dedent("""
+    import json, os, sys, time
+
+    def memory():
+        fields = {}
+        try:
+            with open("/proc/self/smaps_rollup") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) >= 2 and parts[1].isdigit():
+                        fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+        except OSError:
+            pass
+        return {"rss_mib": fields.get("Rss"),
+                "private_mib": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0) if fields else None}
+
+    def serve():
+        import main
+        client = main.app.test_client()
+        status = client.get("/").status_code
+        return dict(memory(), status=status)
+
+    sys.path.insert(0, ROOT)
+    mode = sys.argv[1]
+    if mode == "import":
+        started = time.perf_counter()
+        import main
+        result = dict(memory(), import_s=time.perf_counter() - started,
+                      heavy=[m for m in HEAVY if m in sys.modules])
+        print(json.dumps(result))
+    else:
+        workers = int(sys.argv[2])
+        if mode == "preload":
+            import main
+        pipes = []
+        for _ in range(workers):
+            read, write = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(read)
+                if mode == "preload":
+                    main.after_fork()
+                os.write(write, json.dumps(serve()).encode())
+                os._exit(0)
+            os.close(write)
+            pipes.append((pid, read))
+        results = []
+        for pid, read in pipes:
+            with os.fdopen(read) as f:
+                results.append(json.loads(f.read()))
+            os.waitpid(pid, 0)
+        print(json.dumps(results))
+""")
+
+
+def run_probe(args, env):
+    completed = subprocess.run([sys.executable, "-c", PROBE] + args, capture_output=True, text=True, env=env)
+    if completed.returncode != 0:
+        sys.exit(completed.stderr)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, COS_BACKEND="local", COS_LOCAL_DIR=os.path.join(workdir, "cos"),
+                   COS_BUCKET_NAME="bench", ID_SEQUENCE_DB=os.path.join(workdir, "sequences.db"))
+        global PROBE
+        PROBE = f"ROOT = {ROOT!r}\nHEAVY = {HEAVY!r}\n" + PROBE
+
+        imports = [run_probe(["import"], env) for _ in range(args.runs)]
+        times = sorted(r["import_s"] for r in imports)
+        print(f"import main: median {times[len(times) // 2] * 1000:.0f} ms, min {times[0] * 1000:.0f} ms, "
+              f"RSS {imports[-1]['rss_mib']:.0f} MiB")
+        print(f"heavy modules loaded at import: {', '.join(imports[-1]['heavy']) or 'none'}")
+
+        for mode in ("no-preload", "preload"):
+            workers = run_probe([mode, str(args.workers)], env)
+            rss = sum(w["rss_mib"] or 0 for w in workers) / len(workers)
+            private = sum(w["private_mib"] or 0 for w in workers) / len(workers)
+            print(f"{mode:<11} {args.workers} workers: RSS {rss:.0f} MiB, private {private:.0f} MiB per worker "
+                  f"(status {sorted({w['status'] for w in workers})})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Compare CSV and Parquet for the data_source tables.
+
+Reports the stored size (bytes transferred per full GET) and decode time
+for full reads and for the projected reads the routes make.
+
+    python benchmarks/bench_table_format.py --rows 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from table_format import FORMATS  # noqa: E402
+
+
+def synthetic_tables(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 600, rows), unit="D")
+    description = "Job Title: Engineer\\nSummary:\\n" + "Build and run data systems. " * 40 + "\\nJob Location: Chennai"
+    return {
+        "jd_details": (pd.DataFrame({
+            "job_id": [f"JD{i:06d}" for i in range(rows)],
+            "job_description": description,
+            "job_date": dates.strftime("%d-%m-%Y"),
+        }), ["job_id", "job_date"]),
+        "job_form": (pd.DataFrame({
+            "form_id": [f"FM{i:06d}" for i in range(rows)],
+            "job_id": [f"JD{i:06d}" for i in rng.integers(0, max(rows // 50, 1), rows)],
+            "name": "Applicant Name",
+            "email": [f"applicant{i}@example.com" for i in range(rows)],
+            "phone_number": rng.integers(6_000_000_000, 9_999_999_999, rows),
+            "resume": [f"resume_{i}.pdf" for i in range(rows)],
+            "form_date": dates.strftime("%Y-%m-%d"),
+        }), ["form_id", "job_id"]),
+        "employee_details": (pd.DataFrame({
+            "emp_id": [f"EP{i:06d}" for i in range(rows)],
+            "employee_name": "Employee Name",
+            "email_id": [f"employee{i}@example.com" for i in range(rows)],
+            "department": rng.choice(["IT", "HR", "Finance", "Sales"], rows),
+            "date_of_joining": dates.strftime("%Y-%m-%d"),
+        }), ["emp_id", "email_id"]),
+        "salary_slips": (pd.DataFrame({
+            "slip_id": [f"SP{i:06d}" for i in range(rows)],
+            "emp_id": [f"EP{i:06d}" for i in rng.integers(0, max(rows // 12, 1), rows)],
+            "gross_salary": rng.integers(30_000, 200_000, rows).astype(float),
+            "tax": 0.0,
+            "pf": 0.0,
+            "net_salary": 0.0,
+            "slip_date": dates.strftime("%Y-%m-%d"),
+        }), ["emp_id", "slip_date"]),
+    }
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'table':<18}{'format':<9}{'bytes':>14}{'full ms':>10}{'proj ms':>10}")
+    for table, (df, projection) in synthetic_tables(args.rows).items():
+        for fmt in FORMATS.values():
+            body = fmt.encode(df)
+            full = timed(lambda: fmt.decode(body), args.repeat)
+            projected = timed(lambda: fmt.decode(body, projection), args.repeat)
+            print(f"{table:<18}{fmt.name:<9}{len(body):>14,}{full:>10.1f}{projected:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Concurrency capacity of sync versus gthread gunicorn workers.
+
+Serves the app under gunicorn against a seeded local COS whose every call
+takes ``--cos-latency`` seconds, so requests are dominated by waiting on
+storage as they are in production. For each worker class, ``--clients``
+keep-alive HTTP clients hammer a mix of the job board, job detail,
+applicant and employee routes for ``--duration`` seconds, and the
+benchmark reports completed requests per second, latency percentiles and
+failures.
+
+    python benchmarks/bench_workers.py --workers 2 --clients 8,64,256 --cos-latency 0.05
+"""
+import argparse
+import http.client
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_routes import synthetic_tables  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def seed(env, rows):
+    code = (
+        "import sys; sys.path.insert(0, sys.argv[1]); sys.path.insert(0, sys.argv[2])\n"
+        "import main\n"
+        "from bench_routes import synthetic_tables\n"
+        "tables = synthetic_tables(int(sys.argv[3]))\n"
+        "main.save_jobs_df(tables['jobs']); main.save_forms_df(tables['forms'])\n"
+        "main.save_employee_df(tables['employees']); main.save_slips_df(tables['slips'])\n"
+    )
+    subprocess.run([sys.executable, "-c", code, ROOT, os.path.dirname(os.path.abspath(__file__)), str(rows)],
+                   env=env, check=True, capture_output=True)
+
+
+def paths_for(tables, count, seed=0):
+    rng = random.Random(seed)
+    jobs = list(tables["jobs"]["job_id"])
+    applied = list(tables["forms"]["job_id"])
+    employees = list(tables["employees"]["emp_id"])
+    paths = []
+    for _ in range(count):
+        choice = rng.random()
+        if choice < 0.4:
+            paths.append(("GET", "/", None))
+        elif choice < 0.7:
+            paths.append(("GET", f"/job/{rng.choice(jobs)}", None))
+        elif choice < 0.9:
+            paths.append(("GET", f"/api/applicants/{rng.choice(applied)}", None))
+        else:
+            paths.append(("POST", "/api/employee", f'{{"emp_id": "{rng.choice(employees)}"}}'))
+    return paths
+
+
+def load(port, clients, duration, paths):
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(offset):
+        nonlocal failures
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        i = offset
+        while time.monotonic() < deadline:
+            method, path, body = paths[i % len(paths)]
+            i += clients
+            started = time.perf_counter()
+            try:
+                headers = {"Content-Type": "application/json"} if body else {}
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                ok = False
+                connection.close()
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    failures += 1
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.monotonic() - started
+    latencies = np.array(latencies) * 1000
+    return {
+        "throughput": len(latencies) / wall,
+        "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+        "p95_ms": float(np.percentile(latencies, 95)) if len(latencies) else None,
+        "failures": failures,
+    }
+
+
+def wait_until_up(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(process.stderr.read().decode(errors="replace")[-2000:])
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            connection.request("GET", "/")
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--worker-classes", default="sync,gthread")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=64, help="threads per gthread worker")
+    parser.add_argument("--clients", default="8,64,256", help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--cos-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, COS_BACKEND="local", COS_LOCAL_DIR=os.path.join(workdir, "cos"),
+                   COS_BUCKET_NAME="bench", ID_SEQUENCE_DB=os.path.join(workdir, "sequences.db"),
+                   GUNICORN_THREADS=str(args.threads))
+        seed(env, args.rows)
+        env["COS_LOCAL_LATENCY"] = str(args.cos_latency)
+        paths = paths_for(synthetic_tables(args.rows), 5000)
+
+        print(f"{'worker':<8}{'clients':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>10}{'failures':>10}")
+        for worker_class in args.worker_classes.split(","):
+            # gunicorn turns sync into gthread when threads > 1
+            threads = 1 if worker_class == "sync" else args.threads
+            port = free_port()
+            server = subprocess.Popen(
+                [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"),
+                 "--pythonpath", ROOT, "--bind", f"127.0.0.1:{port}", "--workers", str(args.workers),
+                 "--worker-class", worker_class, "--threads", str(threads), "--backlog", "2048", "main:app"],
+                cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            try:
+                wait_until_up(port, server)
+                for clients in (int(c) for c in args.clients.split(",")):
+                    result = load(port, clients, args.duration, paths)
+                    p50 = f"{result['p50_ms']:.1f}" if result["p50_ms"] is not None else "-"
+                    p95 = f"{result['p95_ms']:.1f}" if result["p95_ms"] is not None else "-"
+                    print(f"{worker_class:<8}{clients:>8}{result['throughput']:>9.1f}{p50:>9}{p95:>10}"
+                          f"{result['failures']:>10}")
+            finally:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""Gunicorn settings picked up from the working directory.
+
+Workers are ``gthread`` by default: each request runs on its own thread,
+so a request waiting on COS or SMTP blocks only that thread (botocore and
+smtplib release the GIL during I/O) and one worker keeps
+``GUNICORN_THREADS`` requests in flight. ``GUNICORN_WORKER_CLASS=sync``
+restores one request per process.
+
+``GUNICORN_PRELOAD=1`` imports the app once in the master so workers share
+its pages copy-on-write instead of each importing it. The app creates no
+clients, threads or connections at import, and ``post_fork`` resets what a
+worker must not inherit. ``post_worker_init`` starts each worker's
+background task threads, which warm its caches before it takes traffic.
+"""
+import os
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "64"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "0") == "1"
+
+
+def post_fork(server, worker):
+    if preload_app:
+        import main
+        main.after_fork()
+
+
+def post_worker_init(worker):
+    import main
+    main.task_queue.start()
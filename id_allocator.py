@@ -0,0 +1,110 @@
+"""Block-reserving sequence counters for FM/SP/JD ids.
+
+Each worker reserves ``block_size`` numbers at a time from a shared SQLite
+database (``BEGIN IMMEDIATE`` serialises reservations across gunicorn
+workers on the node) and hands them out from memory, so allocating an id
+never reads a table and never repeats a number. Unused numbers in a
+worker's block are skipped when it exits; ids stay unique, not gapless.
+
+A sequence that has no row yet is seeded once from ``seed()``, which should
+return the highest number already in use and raise if it cannot tell (a
+failed table read must not seed from zero). The seed is read before the
+write lock is taken, so a slow table read never holds up other workers.
+
+``sequences.db`` is local to the node. When a node is replaced, the
+sequences are seeded again from the tables, so ids that were reserved but
+whose rows were never written (a direct resume upload that was never
+completed, a queued background payslip) can be handed out again. Code
+holding such an id must check that the row it finds is its own.
+"""
+import os
+import sqlite3
+import threading
+
+
+class SQLiteSequenceBackend:
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, next_value INTEGER NOT NULL)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def reserve(self, name, count, seed):
+        conn = self._connect()
+        try:
+            # Rows are never deleted, so a sequence seen here stays seeded.
+            seeded = None
+            if conn.execute("SELECT 1 FROM sequences WHERE name = ?", (name,)).fetchone() is None:
+                seeded = seed() + 1
+        except Exception:
+            conn.close()
+            raise
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT next_value FROM sequences WHERE name = ?", (name,)).fetchone()
+            start = row[0] if row else seeded
+            conn.execute(
+                "INSERT OR REPLACE INTO sequences (name, next_value) VALUES (?, ?)",
+                (name, start + count),
+            )
+            conn.execute("COMMIT")
+            return start
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+
+class IdAllocator:
+
+    def __init__(self, backend, block_size=20):
+        self.backend = backend
+        self.block_size = block_size
+        self._blocks = {}
+        self._seeds = {}
+        self._lock = threading.Lock()
+
+    def register(self, prefix, seed, width=3):
+        self._seeds[prefix] = (seed, width)
+
+    def next_number(self, prefix):
+        with self._lock:
+            current, end = self._blocks.get(prefix, (0, 0))
+            if current >= end:
+                seed, _ = self._seeds[prefix]
+                current = self.backend.reserve(prefix, self.block_size, seed)
+                end = current + self.block_size
+            self._blocks[prefix] = (current + 1, end)
+            return current
+
+    def next_id(self, prefix):
+        _, width = self._seeds[prefix]
+        return f"{prefix}{self.next_number(prefix):0{width}d}"
+
+    def next_ids(self, prefix, count):
+        """Reserve ``count`` consecutive ids in one backend call."""
+        seed, width = self._seeds[prefix]
+        start = self.backend.reserve(prefix, count, seed)
+        return [f"{prefix}{n:0{width}d}" for n in range(start, start + count)]
+
+
+def max_id_number(df, column, prefix):
+    """Highest numeric suffix of ``prefix``-ids in ``df[column]``, or 0."""
+    if df.empty or column not in df.columns:
+        return 0
+    ids = df[column].dropna().astype(str)
+    numbers = ids[ids.str.startswith(prefix)].str[len(prefix):]
+    numbers = numbers[numbers.str.isdigit()].astype(int)
+    return int(numbers.max()) if not numbers.empty else 0
+
+
+def create_allocator(data_folder):
+    path = os.getenv("ID_SEQUENCE_DB", os.path.join(data_folder, "sequences.db"))
+    block_size = int(os.getenv("ID_BLOCK_SIZE", "20"))
+    return IdAllocator(SQLiteSequenceBackend(path), block_size=block_size)
@@ -0,0 +1,156 @@
+"""Job description parsing and rendering.
+
+A description is parsed once into ordered blocks (section paragraphs,
+section bullet lists, loose paragraphs) plus its title and location; the
+detail-page HTML and the job-board card are derived from that record and
+cached by job_id and content hash. ``post_job_form``/``delete_job_post``
+invalidate a job's entries explicitly; a changed description also misses
+naturally because its hash changes.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+SECTIONS = {
+    "Summary:": "p",
+    "Responsibilities:": "ul",
+    "Required Skills:": "ul",
+    "Preferred Qualifications:": "ul",
+    "Experience Range:": "p",
+    "Job Location:": "p"
+}
+
+_LINE_BREAKS = re.compile(r'\\n|\n')
+_WHITESPACE = re.compile(r'\s+')
+_LOCATION = re.compile(r'(?:Job\s*)?Location\s*:\s*([A-Za-z ]+)', re.IGNORECASE)
+_LOCATION_INLINE = re.compile(r'Location\s+([A-Za-z ]+)', re.IGNORECASE)
+_LOCATION_END = re.compile(r'\b(Job\s*Type|About\s*Us|Summary)\b')
+_TITLE = re.compile(r'^\s*Job\s*Title\s*:\s*(.+)$', re.IGNORECASE)
+
+
+def extract_location(description):
+    if not description:
+        return "Unknown"
+
+    # Remove line breaks and extra whitespace
+    clean_desc = _WHITESPACE.sub(' ', _LINE_BREAKS.sub(' ', description)).strip()
+
+    # Search for a location pattern
+    match = _LOCATION.search(clean_desc)
+    if match:
+        return match.group(1).strip()
+
+    # Fallback: try 'Location XYZ' pattern
+    match_inline = _LOCATION_INLINE.search(clean_desc)
+    if match_inline:
+        location = match_inline.group(1).strip()
+        location = _LOCATION_END.split(location)[0].strip()
+        return location if location else "Unknown"
+
+    return "Unknown"
+
+
+def parse_description(text):
+    """Structured form of a description: title, location and the ordered
+    blocks ``("section", name, content)``, ``("list", name, items)`` and
+    ``("p", None, line)``."""
+    blocks = []
+    title = None
+    current_list = None
+
+    for line in (text or "").replace("\\n", "\n").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+
+        if title is None:
+            title_match = _TITLE.match(line)
+            if title_match:
+                title = title_match.group(1).strip()
+
+        matched_section = next((s for s in SECTIONS if line.startswith(s)), None)
+
+        if matched_section:
+            content = line.replace(matched_section, "").strip()
+            if SECTIONS[matched_section] == "p":
+                blocks.append(("section", matched_section, content))
+                current_list = None
+            else:
+                current_list = []
+                blocks.append(("list", matched_section, current_list))
+        elif current_list is not None:
+            current_list.append(line.lstrip('-*• ').strip())
+        else:
+            blocks.append(("p", None, line))
+
+    return {"title": title, "location": extract_location(text), "blocks": blocks}
+
+
+def render_description_html(parsed):
+    parts = []
+    for kind, name, content in parsed["blocks"]:
+        if kind == "section":
+            parts.append(f"<h5>{name}</h5>\n<p>{content}</p>\n")
+        elif kind == "list":
+            parts.append(f"<h5>{name}</h5>\n<ul>\n")
+            parts.extend(f"<li>{item}</li>\n" for item in content)
+            parts.append("</ul>\n")
+        else:
+            parts.append(f"<p>{content}</p>\n")
+    return "".join(parts)
+
+
+def card_summary(text, num_words=40):
+    """The job-board teaser: the first 100 characters, flattened to one line
+    and cut to ``num_words`` words (what index.html's clean_jd and
+    truncate_words filters produce)."""
+    summary = (text[:100] + "...").replace('\\n', ' ').replace('\n', ' ').replace('\\', '').strip()
+    words = summary.split()
+    return ' '.join(words[:num_words]) + ('...' if len(words) > num_words else '')
+
+
+def _card(job_id, text, parsed):
+    return {
+        "title": f"Job {job_id}",
+        "company": "Statscog Labs",
+        "location": parsed["location"],
+        "description": card_summary(text),
+        "applyLink": f"/apply?job_id={job_id}",
+        "viewLink": f"/job/{job_id}"
+    }
+
+
+class JobDescriptionCache:
+
+    def __init__(self, max_entries=5000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, job_id, text):
+        """Parsed record for ``text`` with its rendered ``html`` and ``card``."""
+        text = text if isinstance(text, str) else ""
+        key = (job_id, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest())
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry
+
+        parsed = parse_description(text)
+        entry = dict(parsed, html=render_description_html(parsed), card=_card(job_id, text, parsed))
+        with self._lock:
+            self.stats["misses"] += 1
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, job_id):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == job_id]:
+                del self._entries[key]
+                self.stats["invalidations"] += 1
@@ -0,0 +1,117 @@
+"""Sorted views and keyset pagination for the list endpoints.
+
+A ``SortedView`` sorts a table once per DataFrame version (like
+``Repository``, it re-derives only when the loader hands back a new
+object) on a string ``_sort_key`` column, optionally partitioned by another
+column so that e.g. one job's applicants are a contiguous slice found by
+binary search. Pages start after an opaque cursor holding the last row's
+sort key, so a page costs the same however deep into the table it is and
+rows inserted meanwhile do not shift later pages.
+"""
+import base64
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_LIMIT = int(os.getenv("PAGE_SIZE", "50"))
+MAX_LIMIT = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+SORT_KEY = "_sort_key"
+
+
+def encode_cursor(sort_key):
+    return base64.urlsafe_b64encode(json.dumps(sort_key).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Sort key from a cursor, None for an empty one; ValueError if malformed."""
+    if not cursor:
+        return None
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return value
+
+
+def page_limit(value, default=DEFAULT_LIMIT):
+    if value in (None, ""):
+        return default
+    return max(1, min(int(value), MAX_LIMIT))
+
+
+def sort_key(*columns):
+    """Composite key whose string order is the tuple order of ``columns``."""
+    key = columns[0].fillna("").astype(str)
+    for column in columns[1:]:
+        key = key + "\x00" + column.fillna("").astype(str)
+    return key
+
+
+def iso_dates(column):
+    """``YYYY-MM-DD`` strings ("" when unparseable), which sort as dates.
+    The tables mix ISO dates (rows written by the app) with the DD-MM-YYYY
+    dates of the original sheets."""
+    column = column.astype("string")
+    dates = pd.to_datetime(column, errors="coerce", format="ISO8601")
+    dates = dates.fillna(pd.to_datetime(column, errors="coerce", format="%d-%m-%Y"))
+    return dates.dt.strftime("%Y-%m-%d").fillna("")
+
+
+class SortedView:
+
+    def __init__(self, load, prepare, partition=None):
+        """``prepare(df)`` returns a copy with a ``_sort_key`` column (and the
+        ``partition`` column as strings, if given)."""
+        self._load = load
+        self._prepare = prepare
+        self.partition = partition
+        self._lock = threading.Lock()
+        self._source = None
+        self._frame = None
+        self._partitions = None
+
+    def _snapshot(self):
+        """``(frame, partitions)`` from the same table version."""
+        df = self._load()
+        with self._lock:
+            if df is not self._source:
+                frame = self._prepare(df)
+                order = [self.partition, SORT_KEY] if self.partition else [SORT_KEY]
+                self._frame = frame.sort_values(order, kind="stable").reset_index(drop=True)
+                self._partitions = self._frame[self.partition].to_numpy() if self.partition else None
+                self._source = df
+            return self._frame, self._partitions
+
+    def frame(self):
+        return self._snapshot()[0]
+
+    def slice(self, value):
+        """Rows of one partition, still in sort-key order."""
+        frame, partitions = self._snapshot()
+        start = np.searchsorted(partitions, value, side="left")
+        stop = np.searchsorted(partitions, value, side="right")
+        return frame.iloc[start:stop]
+
+    @staticmethod
+    def page(frame, cursor=None, limit=DEFAULT_LIMIT, descending=False):
+        """``(rows, next_cursor)`` for the page after ``cursor`` in a frame
+        sorted by ``_sort_key``; ``next_cursor`` is None on the last page."""
+        after = decode_cursor(cursor)
+        keys = frame[SORT_KEY].to_numpy()
+        if descending:
+            stop = len(keys) if after is None else int(np.searchsorted(keys, after, side="left"))
+            start = max(stop - limit, 0)
+            rows = frame.iloc[start:stop].iloc[::-1]
+            more = start > 0
+        else:
+            start = 0 if after is None else int(np.searchsorted(keys, after, side="right"))
+            rows = frame.iloc[start:start + limit]
+            more = start + limit < len(keys)
+        next_cursor = encode_cursor(rows[SORT_KEY].iloc[-1]) if more and len(rows) else None
+        return rows, next_cursor
@@ -0,0 +1,141 @@
+"""Filesystem stand-in for the COS client, for tests and benchmarks.
+
+Implements the subset of the S3 client API the app uses (get/put/head/
+delete/copy, paginated list_objects_v2, upload_fileobj, ranged GETs and
+conditional GETs answered with a 304 ClientError) over ``<root>/<bucket>/<key>`` files.
+Enable it with ``COS_BACKEND=local`` and ``COS_LOCAL_DIR``.
+"""
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+from ibm_botocore.exceptions import ClientError
+
+
+def _error(code, status, operation):
+    return ClientError({"Error": {"Code": code, "Message": code},
+                        "ResponseMetadata": {"HTTPStatusCode": status}}, operation)
+
+
+class LocalCOS:
+
+    def __init__(self, root, latency=0.0):
+        """``latency`` seconds are slept per call to mimic a remote store."""
+        self.root = root
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._etags = {}
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, bucket, key):
+        path = os.path.normpath(os.path.join(self.root, bucket, key))
+        if not path.startswith(os.path.normpath(os.path.join(self.root, bucket)) + os.sep):
+            raise _error("InvalidKey", 400, "Key")
+        return path
+
+    def _wait(self):
+        if self.latency:
+            threading.Event().wait(self.latency)
+
+    def _etag(self, path):
+        stat = os.stat(path)
+        cache_key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            etag = self._etags.get(cache_key)
+        if etag is None:
+            with open(path, "rb") as f:
+                etag = f'"{hashlib.md5(f.read()).hexdigest()}"'
+            with self._lock:
+                self._etags[cache_key] = etag
+        return etag
+
+    def _meta(self, path):
+        stat = os.stat(path)
+        return {
+            "ETag": self._etag(path),
+            "ContentLength": stat.st_size,
+            "LastModified": datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+        }
+
+    def put_object(self, Bucket, Key, Body=b"", **kwargs):
+        self._wait()
+        if hasattr(Body, "read"):
+            Body = Body.read()
+        if isinstance(Body, str):
+            Body = Body.encode("utf-8")
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(Body)
+        os.replace(tmp, path)
+        return {"ETag": self._etag(path)}
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None, Range=None, **kwargs):
+        self._wait()
+        path = self._path(Bucket, Key)
+        if not os.path.isfile(path):
+            raise _error("NoSuchKey", 404, "GetObject")
+        meta = self._meta(path)
+        if IfNoneMatch and IfNoneMatch == meta["ETag"]:
+            raise _error("304", 304, "GetObject")
+        with open(path, "rb") as f:
+            if Range:
+                start, _, end = Range[len("bytes="):].partition("-")
+                f.seek(int(start))
+                body = f.read(int(end) - int(start) + 1 if end else -1)
+                return dict(meta, ContentLength=len(body), Body=io.BytesIO(body))
+            body = f.read()
+        return dict(meta, Body=io.BytesIO(body))
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._wait()
+        path = self._path(Bucket, Key)
+        if not os.path.isfile(path):
+            raise _error("404", 404, "HeadObject")
+        return self._meta(path)
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self._wait()
+        path = self._path(Bucket, Key)
+        if os.path.isfile(path):
+            os.remove(path)
+        return {}
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        source = self.get_object(CopySource["Bucket"], CopySource["Key"])
+        return {"CopyObjectResult": self.put_object(Bucket, Key, source["Body"].read())}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Callback=None, Config=None):
+        self.put_object(Bucket, Key, Fileobj.read())
+
+    def list_objects_v2(self, Bucket, Prefix="", MaxKeys=1000, ContinuationToken=None, StartAfter=None, **kwargs):
+        self._wait()
+        base = os.path.join(self.root, Bucket)
+        keys = []
+        # Only walk the directory the prefix is in, like COS's prefix index.
+        start = os.path.join(base, *Prefix.split("/")[:-1])
+        for directory, _, files in os.walk(start):
+            for name in files:
+                if name.startswith(".tmp-"):
+                    continue
+                key = os.path.relpath(os.path.join(directory, name), base).replace(os.sep, "/")
+                if key.startswith(Prefix):
+                    keys.append(key)
+        keys.sort()
+        after = ContinuationToken or StartAfter
+        if after:
+            keys = [k for k in keys if k > after]
+        page = keys[:MaxKeys]
+        response = {
+            "Contents": [dict(self._meta(self._path(Bucket, k)), Key=k, Size=os.path.getsize(self._path(Bucket, k)))
+                         for k in page],
+            "KeyCount": len(page),
+            "IsTruncated": len(keys) > MaxKeys,
+        }
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = page[-1]
+        return response
@@ -0,0 +1,100 @@
+"""Outbound mail: pooled SMTP connections.
+
+Connections are kept open per login (the HR mail is sent from the
+employee's own address) and health-checked with NOOP before reuse when
+they have been idle. Messages are sent by the "send_email" background
+task, which retries with exponential backoff on failure.
+"""
+import smtplib
+import socket
+import threading
+import time
+
+from metrics import registry as metrics
+
+
+class SMTPPool:
+
+    def __init__(self, host, port, size=4, starttls=True, timeout=30, idle_check=30):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.starttls = starttls
+        self.timeout = timeout
+        self.idle_check = idle_check
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.stats = {"connects": 0, "reused": 0, "dropped": 0}
+
+    def _connect(self, username, password):
+        with metrics.span("smtp_connect_seconds"):
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                server.starttls()
+            if username and password:
+                server.login(username, password)
+        with self._lock:
+            self.stats["connects"] += 1
+        return server
+
+    def _close(self, server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def acquire(self, username, password):
+        while True:
+            with self._lock:
+                idle = self._idle.get(username)
+                server, released_at = idle.pop() if idle else (None, None)
+            if server is None:
+                return self._connect(username, password)
+            if time.monotonic() - released_at < self.idle_check:
+                with self._lock:
+                    self.stats["reused"] += 1
+                return server
+            try:
+                if server.noop()[0] == 250:
+                    with self._lock:
+                        self.stats["reused"] += 1
+                    return server
+            except OSError:
+                # SMTP errors and dead sockets alike
+                pass
+            with self._lock:
+                self.stats["dropped"] += 1
+            self._close(server)
+
+    def release(self, username, server, broken=False):
+        if broken:
+            self._close(server)
+            return
+        with self._lock:
+            idle = self._idle.setdefault(username, [])
+            if len(idle) < self.size:
+                idle.append((server, time.monotonic()))
+                return
+        self._close(server)
+
+    def send(self, message, username, password):
+        # A pooled connection the server has since dropped gets one
+        # immediate retry on a fresh connection. Other SMTP errors (refused
+        # recipients, rejected data) leave the connection usable and are
+        # not retried here. SMTPException subclasses OSError, so the
+        # transport errors are named one by one.
+        for attempt in (1, 2):
+            server = self.acquire(username, password)
+            try:
+                with metrics.span("smtp_send_seconds"):
+                    server.send_message(message)
+            except (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout):
+                self.release(username, server, broken=True)
+                if attempt == 2:
+                    raise
+                continue
+            except Exception:
+                self.release(username, server)
+                raise
+            self.release(username, server)
+            return
@@ -1,25 +1,35 @@
 import os
-import re
-import io
+import json
 import smtplib
-import ibm_boto3
+import threading
+import time
+import click
 import pandas as pd
-from flask import Flask, render_template, request, redirect, url_for, jsonify
-from werkzeug.utils import secure_filename
+from flask import Flask, Response, render_template, request, redirect, url_for, jsonify, stream_with_context
 from markupsafe import Markup
-from ibm_botocore.client import Config
-from io import StringIO
-from fpdf import FPDF
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import  Table, TableStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.lib.utils import ImageReader
-from reportlab.pdfgen import canvas
 from datetime import datetime
 from email.mime.text import MIMEText
-from email.message import EmailMessage
 from dotenv import load_dotenv
+from table_cache import table_cache, NotModified
+from repository import Repository
+from append_log import AppendLog
+from id_allocator import create_allocator, max_id_number
+from table_format import get_format, storage_key, FORMATS
+from mailer import SMTPPool
+from resume_text import ResumeTextStore
+from resume_ingest import ResumeIngestor
+from job_descriptions import JobDescriptionCache
+from payslip_catalog import PayslipCatalog
+from payroll_analytics import PayrollAnalytics
+from storage import (LazyClient, Storage, create_client, create_presign_client,
+                     PRESIGN_ENABLED, PRESIGN_EXPIRES)
+from resume_uploads import RESUME_MAX_BYTES, SNIFF_BYTES, UploadRejected, UploadTokens, check_contents, check_declared
+from sqlite_store import create_table_store
+from metrics import registry as metrics, instrument_app, InstrumentedClient, profiler
+from listing import SortedView, SORT_KEY, decode_cursor, encode_cursor, iso_dates, page_limit, sort_key
+from search import SearchIndex
+from response_cache import PageCache
+from tasks import TaskQueue, HIGH, LOW
 
 load_dotenv()
 
@@ -28,19 +38,33 @@ COS_API_KEY_ID = os.getenv("COS_API_KEY_ID")
 COS_INSTANCE_CRN = os.getenv("COS_INSTANCE_CRN")
 COS_BUCKET_NAME = os.getenv("COS_BUCKET_NAME")
 
-cos = ibm_boto3.client("s3",
-    ibm_api_key_id=COS_API_KEY_ID,
-    ibm_service_instance_id=COS_INSTANCE_CRN,
-    config=Config(signature_version="oauth"),
-    endpoint_url=COS_ENDPOINT
-)
-
-EMAIL_HOST = "webmail.4technologies.in"
-EMAIL_PORT = 587  # STARTTLS port
+# Built on first use, so importing the app (or preloading it in the gunicorn
+# master) opens no connections.
+_cos_client = LazyClient(lambda: create_client(COS_ENDPOINT, COS_API_KEY_ID, COS_INSTANCE_CRN))
+# Direct uploads trust a signed token naming the form and its resume key,
+# so they stay off unless SECRET_KEY (shared by all workers) is set.
+SECRET_KEY = os.getenv("SECRET_KEY")
+if PRESIGN_ENABLED and not SECRET_KEY:
+    print("[WARN] SECRET_KEY is not set; direct resume uploads are disabled.")
+DIRECT_UPLOADS = PRESIGN_ENABLED and bool(SECRET_KEY)
+_presign_client = LazyClient(lambda: create_presign_client(COS_ENDPOINT)) if DIRECT_UPLOADS else None
+cos = InstrumentedClient(_cos_client)
+storage = Storage(cos, COS_BUCKET_NAME, presign_client=_presign_client)
+# Binds a reserved form id to its direct upload.
+upload_tokens = UploadTokens(SECRET_KEY, PRESIGN_EXPIRES + 600) if DIRECT_UPLOADS else None
+
+EMAIL_HOST = os.getenv("EMAIL_HOST", "webmail.4technologies.in")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", "587"))  # STARTTLS port
+EMAIL_STARTTLS = os.getenv("EMAIL_STARTTLS", "1") == "1"
 EMAIL_USERNAME = os.getenv("EMAIL_USERNAME")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
+HR_EMAIL = "saad.shaik@4technologies.in"
+
+smtp_pool = SMTPPool(EMAIL_HOST, EMAIL_PORT, size=int(os.getenv("SMTP_POOL_SIZE", "4")),
+                     starttls=EMAIL_STARTTLS)
 
 app = Flask(__name__)
+instrument_app(app)
 UPLOAD_FOLDER = 'resumes'
 DATA_FOLDER = 'data_source'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
@@ -54,42 +78,191 @@ EXCEL_FORMS_FILE = os.path.join(DATA_FOLDER, 'job_form.csv')
 ZOOM_LINK = os.getenv("ZOOM_LINK")
 
 
-def read_csv_from_cos(key):
+TABLE_FORMAT = get_format()
+# "cos" keeps the tables as objects in COS; "sqlite" keeps them in a local
+# SQLite database snapshotted to COS (see sqlite_store).
+TABLE_BACKEND = os.getenv("TABLE_BACKEND", "cos").lower()
+
+def _fetch_table_from_cos(key, columns=None, etag=None):
+    params = {"Bucket": COS_BUCKET_NAME, "Key": storage_key(key, TABLE_FORMAT)}
+    if etag:
+        params["IfNoneMatch"] = etag
+    try:
+        response = cos.get_object(**params)
+    except Exception as e:
+        # ClientError; matched by its response so ibm_botocore is not imported here
+        error = getattr(e, "response", None) or {}
+        status = error.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        if status == 304 or error.get("Error", {}).get("Code") in ("304", "NotModified"):
+            raise NotModified(key)
+        raise
+    body = response["Body"].read()
+    return TABLE_FORMAT.decode(body, columns), response.get("ETag")
+
+def _is_missing(error):
+    return (getattr(error, "response", None) or {}).get("Error", {}).get("Code") in ("NoSuchKey", "404")
+
+def read_table_from_cos(key, columns=None):
+    """Read ``key`` through the table cache. Only a missing object reads as
+    an empty table; any other error is raised."""
+    # Projected reads are cached separately from the full table.
+    cache_key = f"{key}|{','.join(columns)}" if columns else key
+    try:
+        with metrics.span("table_read_seconds", table=key):
+            return table_cache.get(cache_key, lambda _, etag: _fetch_table_from_cos(key, columns, etag))
+    except Exception as e:
+        if _is_missing(e):
+            return pd.DataFrame()
+        metrics.inc("table_read_errors_total", table=key)
+        raise
+
+def read_csv_from_cos(key, columns=None):
     try:
-        response = cos.get_object(Bucket=COS_BUCKET_NAME, Key=key)
-        csv_body = response["Body"].read().decode("utf-8")
-        return pd.read_csv(StringIO(csv_body))
+        return read_table_from_cos(key, columns)
     except Exception as e:
         print(f"⚠️ Error reading {key}: {e}")
         return pd.DataFrame()
 
 def write_csv_to_cos(filename, df):
-    csv_buffer = io.StringIO()
-    df.to_csv(csv_buffer, index=False)
-    cos.put_object(
-        Bucket=COS_BUCKET_NAME,
-        Key=filename,
-        Body=csv_buffer.getvalue()
-    )
+    with metrics.span("table_write_seconds", table=filename):
+        response = cos.put_object(
+            Bucket=COS_BUCKET_NAME,
+            Key=storage_key(filename, TABLE_FORMAT),
+            Body=TABLE_FORMAT.encode(df)
+        )
+    table_cache.put(filename, df, response.get("ETag"))
 
 JD_CSV_KEY = "jd_details.csv"
 FORM_CSV_KEY = "job_form.csv"
 EMPLOYEE_CSV_KEY = "employee_details.csv"
-
-def load_jobs_df():
-    return read_csv_from_cos(JD_CSV_KEY)
+SLIPS_CSV_KEY = "salary_slips.csv"
+
+table_store = create_table_store(DATA_FOLDER, lambda: cos, COS_BUCKET_NAME)
+sqlite_tables = {
+    JD_CSV_KEY: table_store.table(JD_CSV_KEY, "job_id"),
+    FORM_CSV_KEY: table_store.table(FORM_CSV_KEY, "form_id", ["job_id"]),
+    EMPLOYEE_CSV_KEY: table_store.table(EMPLOYEE_CSV_KEY, "emp_id"),
+    SLIPS_CSV_KEY: table_store.table(SLIPS_CSV_KEY, "slip_id", ["emp_id"]),
+}
+
+def read_table(key, columns=None, strict=False):
+    """``strict`` raises read errors instead of returning an empty table."""
+    if TABLE_BACKEND == "sqlite":
+        return sqlite_tables[key].read(columns)
+    return read_table_from_cos(key, columns) if strict else read_csv_from_cos(key, columns)
+
+def write_table(key, df):
+    if TABLE_BACKEND == "sqlite":
+        sqlite_tables[key].replace(df)
+    else:
+        write_csv_to_cos(key, df)
+
+def load_jobs_df(columns=None):
+    return read_table(JD_CSV_KEY, columns)
 
 def save_jobs_df(df):
-    write_csv_to_cos(df, JD_CSV_KEY)
+    write_table(JD_CSV_KEY, df)
 
 def load_forms_df():
-    return read_csv_from_cos(FORM_CSV_KEY)
+    return forms_log.read()
 
 def save_forms_df(df):
-    write_csv_to_cos(df, FORM_CSV_KEY)
+    write_table(FORM_CSV_KEY, df)
 
 def load_employee_df():
-    return read_csv_from_cos(EMPLOYEE_CSV_KEY)
+    return read_table(EMPLOYEE_CSV_KEY)
+
+def load_slips_df():
+    return slips_log.read()
+
+def save_slips_df(df):
+    write_table(SLIPS_CSV_KEY, df)
+
+def save_employee_df(df):
+    write_table(EMPLOYEE_CSV_KEY, df)
+
+# job_form.csv and salary_slips.csv only ever grow, so new rows are written as
+# shards and merged into the base CSV by `flask compact-logs`.
+FORM_SHARD_PREFIX = "shards/job_form/"
+SLIPS_SHARD_PREFIX = "shards/salary_slips/"
+
+def fetch_table_from_cos(key):
+    """Read ``key`` from COS, bypassing the table cache. Only a missing
+    object reads as an empty table; any other error is raised."""
+    try:
+        return _fetch_table_from_cos(key)[0]
+    except Exception as e:
+        if _is_missing(e):
+            return pd.DataFrame()
+        raise
+
+cos_forms_log = AppendLog(lambda: cos, COS_BUCKET_NAME, FORM_CSV_KEY, FORM_SHARD_PREFIX,
+                          lambda: read_table_from_cos(FORM_CSV_KEY),
+                          lambda df: write_csv_to_cos(FORM_CSV_KEY, df), ttl=table_cache.ttl,
+                          fetch_base=lambda: fetch_table_from_cos(FORM_CSV_KEY),
+                          lock_path=os.path.join(DATA_FOLDER, "job_form.compact.lock"))
+cos_slips_log = AppendLog(lambda: cos, COS_BUCKET_NAME, SLIPS_CSV_KEY, SLIPS_SHARD_PREFIX,
+                          lambda: read_table_from_cos(SLIPS_CSV_KEY),
+                          lambda df: write_csv_to_cos(SLIPS_CSV_KEY, df), ttl=table_cache.ttl,
+                          fetch_base=lambda: fetch_table_from_cos(SLIPS_CSV_KEY),
+                          lock_path=os.path.join(DATA_FOLDER, "salary_slips.compact.lock"))
+
+# SQLite tables insert rows in place, so they stand in for the append logs.
+if TABLE_BACKEND == "sqlite":
+    forms_log, slips_log = sqlite_tables[FORM_CSV_KEY], sqlite_tables[SLIPS_CSV_KEY]
+    jobs_remove = sqlite_tables[JD_CSV_KEY].remove
+    jobs_append = sqlite_tables[JD_CSV_KEY].append
+else:
+    forms_log, slips_log = cos_forms_log, cos_slips_log
+    jobs_remove = jobs_append = None
+
+jobs_repo = Repository(load_jobs_df, save_jobs_df, "job_id", append=jobs_append, remove=jobs_remove)
+forms_repo = Repository(load_forms_df, save_forms_df, "form_id", group_column="job_id",
+                        append=forms_log.append)
+employees_repo = Repository(load_employee_df, save_employee_df, "emp_id")
+
+resume_texts = ResumeTextStore(lambda: cos, COS_BUCKET_NAME)
+resume_ingestor = ResumeIngestor(lambda: cos, COS_BUCKET_NAME, resume_texts)
+jd_cache = JobDescriptionCache()
+payslip_catalog = PayslipCatalog(lambda: cos, COS_BUCKET_NAME)
+payroll_analytics = PayrollAnalytics(load_slips_df, load_employee_df)
+
+# Sequences are seeded from the tables the first time they are used.
+id_allocator = create_allocator(DATA_FOLDER)
+# Seeds must see the real tables: a read error raises rather than seeding
+# from an empty frame and reissuing ids.
+def _read_strict(log):
+    return log.read(strict=True) if isinstance(log, AppendLog) else log.read()
+
+id_allocator.register("FM", lambda: max_id_number(_read_strict(forms_log), "form_id", "FM"))
+id_allocator.register("SP", lambda: max_id_number(_read_strict(slips_log), "slip_id", "SP"))
+id_allocator.register("JD", lambda: max_id_number(read_table(JD_CSV_KEY, ["job_id"], strict=True), "job_id", "JD"))
+
+# Work handed off by routes and periodic jobs; the handlers are registered
+# with the routes that use them, further down.
+task_queue = TaskQueue(os.getenv("TASK_QUEUE_DB", os.path.join(DATA_FOLDER, "tasks.db")))
+TASK_COMPACT_INTERVAL = float(os.getenv("TASK_COMPACT_INTERVAL", "3600"))
+TASK_WARM_INTERVAL = float(os.getenv("TASK_WARM_INTERVAL", "0"))
+
+# Matching pulls in scipy and spaCy; it is imported on first use.
+_match_engine = None
+
+
+def get_match_engine():
+    global _match_engine
+    if _match_engine is None:
+        from matching import MatchEngine
+        _match_engine = MatchEngine()
+    return _match_engine
+
+
+def after_fork():
+    """Reset per-process state in a freshly forked worker (gunicorn post_fork)."""
+    _cos_client.reset()
+    if _presign_client is not None:
+        _presign_client.reset()
+    if profiler is not None:
+        profiler.start()
 
 
 @app.template_filter('truncate_words')
@@ -111,128 +284,337 @@ def clean_jd(text):
 def format_jd(text):
     if not text:
         return ""
+    return Markup(jd_cache.get(None, text)["html"])
 
-    sections = {
-        "Summary:": "p",
-        "Responsibilities:": "ul",
-        "Required Skills:": "ul",
-        "Preferred Qualifications:": "ul",
-        "Experience Range:": "p",
-        "Job Location:": "p"
-    }
-
-    lines = text.replace("\\n", "\n").splitlines()
-    html_output = ""
-    current_section = None
 
-    for line in lines:
-        line = line.strip()
-        if not line:
+@app.cli.command("compact-logs")
+def compact_logs():
+    """Merge appended job_form/salary_slips shards into the base CSVs."""
+    for log in (cos_forms_log, cos_slips_log):
+        try:
+            merged = log.compact()
+        except Exception as e:
+            print(f"{log.base_key}: compaction aborted, shards kept: {e}")
             continue
-
-        matched_section = next((s for s in sections if line.startswith(s)), None)
-
-        if matched_section:
-            if current_section and sections[current_section] == "ul":
-                html_output += "</ul>\n"
-            current_section = matched_section
-            tag = sections[matched_section]
-            content = line.replace(matched_section, "").strip()
-            if tag == "p":
-                html_output += f"<h5>{matched_section}</h5>\n<p>{content}</p>\n"
-                current_section = None
-            elif tag == "ul":
-                html_output += f"<h5>{matched_section}</h5>\n<ul>\n"
+        print(f"{log.base_key}: merged {merged} shard(s)")
+
+
+@app.cli.command("migrate-tables")
+@click.option("--source", default=None,
+              help="Read the CSVs from this local folder (e.g. data_source) instead of COS.")
+def migrate_tables(source):
+    """Convert the four tables from CSV to TABLE_FORMAT in COS."""
+    csv_format = FORMATS["csv"]
+    for key in (JD_CSV_KEY, FORM_CSV_KEY, EMPLOYEE_CSV_KEY, SLIPS_CSV_KEY):
+        if source:
+            with open(os.path.join(source, key), "rb") as f:
+                body = f.read()
         else:
-            if current_section and sections[current_section] == "ul":
-                html_output += f"<li>{line.lstrip('-*• ').strip()}</li>\n"
-            else:
-                html_output += f"<p>{line}</p>\n"
+            body = cos.get_object(Bucket=COS_BUCKET_NAME, Key=key)["Body"].read()
+        df = csv_format.decode(body)
+        write_csv_to_cos(key, df)
+        print(f"{key} -> {storage_key(key, TABLE_FORMAT)}: {len(df)} rows")
+
+
+@app.cli.command("migrate-sqlite")
+@click.option("--source", default=None,
+              help="Read the CSVs from this local folder (e.g. data_source) instead of COS.")
+def migrate_sqlite(source):
+    """Load the four tables into the SQLite store and snapshot it to COS."""
+    cos_tables = {FORM_CSV_KEY: cos_forms_log.read, SLIPS_CSV_KEY: cos_slips_log.read}
+    for key, table in sqlite_tables.items():
+        if source:
+            with open(os.path.join(source, key), "rb") as f:
+                df = FORMATS["csv"].decode(f.read())
+        else:
+            df = cos_tables.get(key, lambda: read_csv_from_cos(key))()
+        if df.empty:
+            print(f"{key}: no rows found, left as is")
+            continue
+        table.replace(df)
+        print(f"{key} -> {table_store.path}:{table.name}: {len(df)} rows")
+    if table_store.snapshot(force=True):
+        print(f"Snapshot uploaded to {table_store.snapshot_key}")
+
+
+@app.cli.command("run-payroll")
+@click.option("--file", "salaries_file", type=click.Path(exists=True),
+              help="CSV with emp_id and gross_salary columns.")
+@click.option("--all", "all_employees", is_flag=True, help="Pay every employee --gross-salary.")
+@click.option("--gross-salary", type=float)
+def run_payroll(salaries_file, all_employees, gross_salary):
+    """Generate payslips for many employees in one batch."""
+    import payroll
+
+    if salaries_file:
+        entries = pd.read_csv(salaries_file)[["emp_id", "gross_salary"]].to_dict("records")
+    else:
+        entries = _payroll_entries({"all": all_employees, "gross_salary": gross_salary})
+    if not entries:
+        raise click.UsageError("Pass --file, or --all with --gross-salary.")
+
+    run = payroll.PayrollRun(entries)
+    payroll.execute_run(run, **_payroll_dependencies())
+    result = run.to_dict()
+    print(f"{result['status']}: {result['uploaded']}/{result['total']} payslips uploaded, "
+          f"{len(result['failed'])} failed")
+    for failure in result["failed"]:
+        print(f"  {failure['emp_id']}: {failure['error']}")
+
+
+@app.cli.command("run-tasks")
+def run_tasks():
+    """Work through queued background tasks and periodic jobs until stopped."""
+    task_queue.start()
+    print(f"{task_queue.workers} task worker(s) on {task_queue.path}")
+    threading.Event().wait()
+
+
+@app.cli.command("ingest-resumes")
+def ingest_resumes():
+    """Build resume records for applications submitted before ingestion ran."""
+    df = forms_repo.dataframe()
+    for row in df.to_dict("records"):
+        if not isinstance(row.get("resume"), str) or resume_ingestor.get_record(row["form_id"]):
+            continue
+        try:
+            record = resume_ingestor.ingest(row["form_id"], row["job_id"], f"{UPLOAD_FOLDER}/{row['resume']}")
+        except Exception as e:
+            record = None
+            print(f"{row['form_id']}: {e}")
+        if record:
+            print(f"{row['form_id']}: {len(record['skills'])} skills, {record['years_experience']} years")
+
 
-    if current_section and sections[current_section] == "ul":
-        html_output += "</ul>\n"
+JOBS_PER_PAGE = int(os.getenv("JOBS_PER_PAGE", "24"))
+JOB_COLUMNS = ["job_id", "job_description", "job_date"]
+APPLICANT_COLUMNS = ["form_id", "job_id", "name", "email", "phone_number", "resume", "form_date"]
 
-    return Markup(html_output)
 
+def _prepare_jobs(df):
+    df = df.reindex(columns=JOB_COLUMNS).dropna(subset=["job_id"])
+    df["job_id"] = df["job_id"].astype(str)
+    df["job_description"] = df["job_description"].fillna("").astype(str)
+    df["job_date"] = iso_dates(df["job_date"])
+    df["location"] = [jd_cache.get(job_id, text)["location"]
+                      for job_id, text in zip(df["job_id"], df["job_description"])]
+    df[SORT_KEY] = sort_key(df["job_date"], df["job_id"])
+    return df
 
-def extract_location(description):
-    if not description:
-        return "Unknown"
 
-    # Remove line breaks and extra whitespace
-    clean_desc = re.sub(r'\\n|\n', ' ', description)
-    clean_desc = re.sub(r'\s+', ' ', clean_desc).strip()
+def _prepare_applicants(df):
+    df = df.reindex(columns=APPLICANT_COLUMNS).dropna(subset=["job_id"])
+    df["job_id"] = df["job_id"].astype(str)
+    df["applied_on"] = iso_dates(df["form_date"])
+    df[SORT_KEY] = sort_key(df["applied_on"], df["form_id"])
+    return df
 
-    # Search for a location pattern
-    match = re.search(r'(?:Job\s*)?Location\s*:\s*([A-Za-z ]+)', clean_desc, re.IGNORECASE)
-    if match:
-        return match.group(1).strip()
 
-    # Fallback: try 'Location XYZ' pattern
-    match_inline = re.search(r'Location\s+([A-Za-z ]+)', clean_desc, re.IGNORECASE)
-    if match_inline:
-        location = match_inline.group(1).strip()
-        location = re.split(r'\b(Job\s*Type|About\s*Us|Summary)\b', location)[0].strip()
-        return location if location else "Unknown"
+# Sorted once per table version; list endpoints filter and page these.
+jobs_view = SortedView(lambda: load_jobs_df(JOB_COLUMNS), _prepare_jobs)
+applicants_view = SortedView(load_forms_df, _prepare_applicants, partition="job_id")
 
-    return "Unknown"
+# Rendered job board pages, re-rendered only when the jobs table changes.
+page_cache = PageCache()
 
-def generate_payslip_pdf(emp_data, slip_data, logo_path, output_path):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", "B", 16)
 
-    # Title
-    pdf.image(logo_path, x=10, y=8, w=30)
-    pdf.cell(200, 10, txt="STATSCOG Labs PVT LTD", ln=True, align='C')
-    pdf.ln(10)
-    pdf.set_font("Arial", "", 12)
+def _iso_date(value):
+    return pd.Timestamp(value).strftime("%Y-%m-%d")
 
-    # Header
-    pdf.cell(200, 10, txt="Payslip (Electronically Generated)", ln=True, align='C')
-    pdf.ln(10)
 
-    # Table rows
-    rows = [
-        ("Payslip ID", slip_data["slip_id"]),
-        ("Employee ID", emp_data["emp_id"]),
-        ("Employee Name", emp_data["employee_name"]),
-        ("Gross Salary", f"₹ {slip_data['gross_salary']:.2f}"),
-        ("Tax (%)", f"{slip_data['tax']}%"),
-        ("PF (%)", f"{slip_data['pf']}%"),
-        ("Net Salary", f"₹ {slip_data['net_salary']:.2f}"),
-        ("Slip Date", slip_data["slip_date"].strftime("%Y-%m-%d"))
-    ]
+def _filter_listing(frame, date_column, text_columns):
+    """Apply the date_from / date_to / q (and, for jobs, location) query
+    parameters to a sorted frame."""
+    mask = pd.Series(True, index=frame.index)
+    if request.args.get("date_from"):
+        mask &= frame[date_column] >= _iso_date(request.args["date_from"])
+    if request.args.get("date_to"):
+        mask &= frame[date_column] <= _iso_date(request.args["date_to"])
+    if request.args.get("location") and "location" in frame.columns:
+        mask &= frame["location"].str.contains(request.args["location"], case=False, regex=False)
+    keyword = request.args.get("q")
+    if keyword:
+        matches = pd.Series(False, index=frame.index)
+        for column in text_columns:
+            matches |= frame[column].fillna("").astype(str).str.contains(keyword, case=False, regex=False)
+        mask &= matches
+    return frame[mask]
 
-    for label, value in rows:
-        pdf.cell(60, 10, f"{label}:", 1)
-        pdf.cell(120, 10, str(value), 1, ln=True)
 
-    pdf.output(output_path)
+def _missing_to_none(value):
+    return None if value is pd.NA or (isinstance(value, float) and value != value) else value
 
 
+def _records(rows, columns):
+    # Column lists and zip are far cheaper than DataFrame.to_dict for a page
+    names = list(columns.values())
+    values = zip(*(rows[column].tolist() for column in columns))
+    return [dict(zip(names, map(_missing_to_none, row))) for row in values]
+
 
 @app.route('/')
+@page_cache.cached(jobs_view.frame)
 def index():
+    try:
+        frame = _filter_listing(jobs_view.frame(), "job_date", ["job_description"])
+        rows, next_cursor = SortedView.page(frame, request.args.get("cursor"), JOBS_PER_PAGE, descending=True)
+    except ValueError:
+        return redirect(url_for('index'))
+
+    jobs = [jd_cache.get(job_id, text)["card"] for job_id, text in zip(rows["job_id"], rows["job_description"])]
+
+    return render_template('index.html', jobs=jobs, next_cursor=next_cursor)
+
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    try:
+        frame = _filter_listing(jobs_view.frame(), "job_date", ["job_id", "job_description"])
+        rows, next_cursor = SortedView.page(frame, request.args.get("cursor"), page_limit(request.args.get("limit")),
+                                            descending=request.args.get("order", "desc") != "asc")
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    jobs = [_job_summary(job_id, text, job_date)
+            for job_id, text, job_date in zip(rows["job_id"], rows["job_description"], rows["job_date"])]
+
+    return jsonify({"status": "success", "jobs": jobs, "next_cursor": next_cursor})
+
+
+def _job_summary(job_id, text, job_date):
+    description = jd_cache.get(job_id, text)
+    return {
+        "job_id": job_id,
+        "job_title": description["title"] or description["card"]["title"],
+        "job_location": description["location"],
+        "job_summary": description["card"]["description"],
+        "job_date": job_date
+    }
+
+
+# Full-text search over job descriptions and ingested resume text. Both
+# indexes are updated as jobs are posted/deleted and resumes ingested, and
+# caught up with the tables (written by other workers too) before a query.
+SEARCH_RETRY_SECONDS = float(os.getenv("SEARCH_RETRY_SECONDS", "60"))
+job_search = SearchIndex()
+candidate_search = SearchIndex()
+_search_lock = threading.Lock()
+_search_state = {"jobs": None, "job_rows": {}, "forms": None, "misses": {}, "retried_at": 0.0}
+
+
+def _sync_job_search():
+    frame = jobs_view.frame()
+    with _search_lock:
+        if _search_state["jobs"] is not frame:
+            job_search.sync(dict(zip(frame["job_id"], frame["job_description"])))
+            _search_state["job_rows"] = dict(zip(frame["job_id"], zip(frame["job_description"], frame["job_date"])))
+            _search_state["jobs"] = frame
+        return _search_state["job_rows"]
+
+
+def _index_candidate(form_id, name, record):
+    if record:
+        candidate_search.add(form_id, f"{name or ''} {record.get('text', '')}")
+
+
+def _sync_candidate_search():
+    """Index the resume records of applicants missing from the index. A form
+    whose record did not exist is not fetched again until its row changes
+    or a listing of the records, at most every SEARCH_RETRY_SECONDS, shows
+    that the record has been written."""
+    df = forms_repo.dataframe()
+    with _search_lock:
+        misses = _search_state["misses"]
+        retry = bool(misses) and time.monotonic() - _search_state["retried_at"] >= SEARCH_RETRY_SECONDS
+        if _search_state["forms"] is df and not retry:
+            return
+        _search_state["forms"] = df
+        if "resume" not in df.columns:
+            return
+        pending = {form_id: (name, resume) for form_id, name, resume in zip(df["form_id"], df["name"], df["resume"])
+                   if isinstance(resume, str) and form_id not in candidate_search}
+        if retry:
+            _search_state["retried_at"] = time.monotonic()
+            recorded = resume_ingestor.recorded_ids()
+            misses = {form_id: resume for form_id, resume in misses.items() if form_id not in recorded}
+        # Forget forms indexed elsewhere, and re-fetch those whose row changed.
+        misses = {form_id: resume for form_id, resume in misses.items() if form_id in pending}
+        fetch = [form_id for form_id, (_, resume) in pending.items() if misses.get(form_id) != resume]
+        records = {form_id: storage.submit(resume_ingestor.get_record, form_id) for form_id in fetch}
+        for form_id, future in records.items():
+            name, resume = pending[form_id]
+            record = future.result()
+            if record is None:
+                if not misses:
+                    _search_state["retried_at"] = time.monotonic()
+                misses[form_id] = resume
+            else:
+                misses.pop(form_id, None)
+                _index_candidate(form_id, name, record)
+        _search_state["misses"] = misses
+
+
+def _search_page():
+    """``(query, limit, offset)`` from the request; ValueError if invalid."""
+    query = (request.args.get("q") or "").strip()
+    if not query:
+        raise ValueError("Missing q")
+    cursor = decode_cursor(request.args.get("cursor"))
+    if cursor is not None and not cursor.isdigit():
+        raise ValueError(f"Invalid cursor: {request.args['cursor']}")
+    return query, page_limit(request.args.get("limit"), 20), int(cursor or 0)
+
+
+def _next_search_cursor(offset, limit, total):
+    return encode_cursor(str(offset + limit)) if offset + limit < total else None
+
+
+@app.route('/api/search/jobs', methods=['GET'])
+def search_jobs():
+    try:
+        query, limit, offset = _search_page()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    rows = _sync_job_search()
+    hits, total = job_search.search(query, limit, offset)
+    results = [{**_job_summary(job_id, *rows[job_id]), "score": round(score, 3)}
+               for job_id, score in hits if job_id in rows]
 
-    jobs_df = load_jobs_df()
-    jobs = []
-
-    for _, row in jobs_df.sort_values(by="job_date", ascending=False).iterrows():
-        job_id = row['job_id']
-        job_description = row['job_description']
-        location = extract_location(job_description)
-
-        jobs.append({
-            "title": f"Job {job_id}",
-            "company": "Statscog Labs",
-            "location": location,
-            "description": job_description[:100] + "...",
-            "applyLink": f"/apply?job_id={job_id}",
-            "viewLink": f"/job/{job_id}"
+    return jsonify({"status": "success", "query": query, "total": total, "results": results,
+                    "next_cursor": _next_search_cursor(offset, limit, total)})
+
+
+@app.route('/api/search/candidates', methods=['GET'])
+def search_candidates():
+    try:
+        query, limit, offset = _search_page()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    _sync_candidate_search()
+    job_id = request.args.get("job_id")
+    within = {row["form_id"] for row in forms_repo.by_group(job_id)} if job_id else None
+    hits, total = candidate_search.search(query, limit, offset, within=within)
+
+    rows = [row or {} for row in forms_repo.get_many([form_id for form_id, _ in hits])]
+    applied_on = iso_dates(pd.Series([row.get("form_date") for row in rows], dtype=object)).tolist()
+    results = []
+    for (form_id, score), row, applied in zip(hits, rows, applied_on):
+        record = resume_ingestor.get_record(form_id) or {}
+        results.append({
+            "form_id": form_id,
+            "job_id": row.get("job_id"),
+            "name": _missing_to_none(row.get("name")),
+            "email": _missing_to_none(row.get("email")),
+            "applied_on": applied or None,
+            "score": round(score, 3),
+            "skills": record.get("skills", []),
+            "years_experience": record.get("years_experience")
         })
 
-    return render_template('index.html', jobs=jobs)
+    return jsonify({"status": "success", "query": query, "total": total, "results": results,
+                    "next_cursor": _next_search_cursor(offset, limit, total)})
 
 
 @app.route('/post-job-form', methods=['POST'])
@@ -240,64 +622,79 @@ def post_job_form():
     job_id = request.form.get('job_id')
     job_description = request.form.get('job_description')
 
+    if job_description and not job_id:
+        job_id = id_allocator.next_id("JD")
+
     if job_id and job_description:
-        df = load_jobs_df()
-        df = pd.concat([df, pd.DataFrame([{
+        jd_cache.invalidate(job_id)
+        jobs_repo.insert({
             "job_id": job_id,
             "job_description": job_description,
             "job_date": pd.Timestamp.now().normalize()
-        }])], ignore_index=True)
-        save_jobs_df(df)
+        })
+        job_search.add(job_id, job_description)
+        page_cache.invalidate()
 
     return redirect(url_for('index'))
 
 
 @app.route('/job/<job_id>')
+@page_cache.cached(jobs_view.frame)
 def job_detail(job_id):
-    df = load_jobs_df()
-    row = df[df["job_id"] == job_id]
-    if row.empty:
+    job = jobs_repo.get(job_id)
+    if job is None:
         return render_template("job_details.html", job=None)
 
-    job = row.iloc[0]
+    description = jd_cache.get(job["job_id"], job["job_description"])
     return render_template("job_details.html", job={
         "job_id": job["job_id"],
         "title": f"Job {job['job_id']}",
         "company": "Statscog Labs",
-        "location": "Unknown",
-        "description": job["job_description"]
+        "location": description["location"],
+        "description": job["job_description"],
+        "description_html": Markup(description["html"])
     })
 
 
 @app.route('/apply', methods=['GET', 'POST'])
 def apply_job():
     if request.method == 'POST':
+        # Checked while the body streams in, before it is buffered.
+        request.max_content_length = RESUME_MAX_BYTES + 64 * 1024
         job_id = request.form.get('job_id')
         name = request.form.get('name')
         email = request.form.get('email')
         phone = request.form.get('phone_number')
         file = request.files['resume']
 
-        df = load_forms_df()
-        last_form_id = df['form_id'].dropna().iloc[-1] if not df.empty else "FM000"
-        form_id = f"FM{int(last_form_id[2:]) + 1:03d}"
+        if file:
+            resume_body = file.read()
+            try:
+                filename, _ = check_declared(file.filename, len(resume_body))
+                check_contents(filename, len(resume_body), resume_body[:SNIFF_BYTES])
+            except UploadRejected as e:
+                return f"""
+                    <script>
+                        alert("❌ {e}");
+                        window.history.back();
+                    </script>
+                """, e.status
+
+        form_id = id_allocator.next_id("FM")
 
         if file:
-            filename = secure_filename(file.filename)
-            resume_key = f"resumes/{filename}"
-            cos.upload_fileobj(file, COS_BUCKET_NAME, resume_key)
-
-            df = pd.concat([df, pd.DataFrame([{
-                "form_id": form_id,
-                "job_id": job_id,
-                "name": name,
-                "email": email,
-                "phone_number": phone,
-                "resume": filename,
-                "form_date": pd.Timestamp.now().normalize()
-            }])], ignore_index=True)
-
-            save_forms_df(df)
+            resume = f"{form_id}_{filename}"
+            resume_key = f"{UPLOAD_FOLDER}/{resume}"
+            # The resume upload and the form row write are independent
+            upload = storage.submit(storage.upload, resume_key, resume_body)
+            _record_application(form_id, job_id, name, email, phone, resume)
+            etag = upload.result()
+
+            # Text extraction and skill detection run as a background task,
+            # from these bytes when this process runs it
+            resume_ingestor.hand_off(resume_key, etag, resume_body)
+            task_queue.enqueue("ingest_resume", {"form_id": form_id, "job_id": job_id,
+                                                 "resume_key": resume_key, "name": name})
 
         return f"""
             <script>
@@ -307,26 +704,213 @@ def apply_job():
         """
 
     job_id = request.args.get('job_id')
-    return render_template('job_apply.html', job_id=job_id)
+    return render_template('job_apply.html', job_id=job_id, direct_uploads=storage.presign_client is not None)
+
+
+def _record_application(form_id, job_id, name, email, phone, resume):
+    forms_repo.insert({
+        "form_id": form_id,
+        "job_id": job_id,
+        "name": name,
+        "email": email,
+        "phone_number": phone,
+        "resume": resume,
+        "form_date": pd.Timestamp.now().normalize()
+    })
+
+
+@app.route('/api/apply/upload-url', methods=['POST'])
+def create_resume_upload():
+    """Reserve a form id and presign a direct browser upload of the resume."""
+    if storage.presign_client is None:
+        return jsonify({"status": "error", "message": "Direct uploads are not configured"}), 501
+
+    data = request.get_json(silent=True) or {}
+    job_id = data.get("job_id")
+    if not job_id or not jobs_repo.exists(job_id):
+        return jsonify({"status": "error", "message": f"Job ID '{job_id}' not found."}), 404
+    try:
+        filename, content_type = check_declared(data.get("filename"), data.get("size"))
+    except UploadRejected as e:
+        return jsonify({"status": "error", "message": str(e)}), e.status
+
+    form_id = id_allocator.next_id("FM")
+    resume = f"{form_id}_{filename}"
+    url = storage.presigned_put(f"{UPLOAD_FOLDER}/{resume}", content_type, int(data["size"]))
+
+    return jsonify({
+        "status": "success",
+        "form_id": form_id,
+        "upload": {"method": "PUT", "url": url, "headers": {"Content-Type": content_type}},
+        "token": upload_tokens.issue(form_id=form_id, job_id=job_id, resume=resume),
+        "expires_in": PRESIGN_EXPIRES
+    })
+
+
+@app.route('/api/apply/complete', methods=['POST'])
+def complete_resume_upload():
+    """Record the application once its resume is in COS. Only the object's
+    metadata and first bytes are read, whatever its size."""
+    if upload_tokens is None:
+        return jsonify({"status": "error", "message": "Direct uploads are not configured"}), 501
+
+    data = request.get_json(silent=True) or {}
+    try:
+        claims = upload_tokens.redeem(data.get("token"))
+        form_id, job_id, resume = claims["form_id"], claims["job_id"], claims["resume"]
+        existing = forms_repo.get(form_id)
+        if existing is not None:
+            # A reissued form id (see id_allocator) may belong to another application.
+            if existing.get("resume") != resume:
+                raise UploadRejected("This upload's form id was taken by another application; start a new upload.",
+                                     status=409)
+            return jsonify({"status": "success", "form_id": form_id})
+        resume_key = f"{UPLOAD_FOLDER}/{resume}"
+        try:
+            size = storage.head(resume_key).get("ContentLength")
+        except Exception:
+            raise UploadRejected("Resume upload not found; upload the file before completing.", status=409)
+        try:
+            check_contents(resume, size, storage.get_range(resume_key, 0, SNIFF_BYTES - 1))
+        except UploadRejected:
+            storage.delete(resume_key)
+            raise
+    except UploadRejected as e:
+        return jsonify({"status": "error", "message": str(e)}), e.status
+
+    name = data.get("name")
+    _record_application(form_id, job_id, name, data.get("email"), data.get("phone_number"), resume)
+    task_queue.enqueue("ingest_resume", {"form_id": form_id, "job_id": job_id, "resume_key": resume_key,
+                                         "name": name})
+
+    return jsonify({"status": "success", "form_id": form_id})
+
+
+APPLICANT_FIELDS = {
+    "form_id": "form_id",
+    "name": "name",
+    "email": "email",
+    "phone_number": "phone",
+    "resume": "resume_file",
+    "applied_on": "applied_on"
+}
 
 
 @app.route('/api/applicants/<job_id>', methods=['GET'])
 def get_applicants_by_job(job_id):
-    df = load_forms_df()
-    df_job = df[df["job_id"] == job_id]
-
-    applicants = []
-    for _, row in df_job.iterrows():
-        applicants.append({
+    try:
+        frame = _filter_listing(applicants_view.slice(job_id), "applied_on", ["name", "email"])
+        ndjson = request.args.get("format") == "ndjson"
+        if ndjson and not request.args.get("limit"):
+            # Without a limit the whole (filtered) list is streamed.
+            limit = max(len(frame), 1)
+        else:
+            limit = page_limit(request.args.get("limit"))
+        rows, next_cursor = SortedView.page(frame, request.args.get("cursor"), limit,
+                                            descending=request.args.get("order") == "desc")
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    if ndjson:
+        def generate():
+            for start in range(0, len(rows), 500):
+                for record in _records(rows.iloc[start:start + 500], APPLICANT_FIELDS):
+                    yield json.dumps(record) + "\n"
+            if next_cursor:
+                yield json.dumps({"next_cursor": next_cursor}) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    return jsonify({"job_id": job_id, "applicants": _records(rows, APPLICANT_FIELDS), "next_cursor": next_cursor})
+
+
+@app.route('/resumes/<job_id>', methods=['GET'])
+def get_resumes_for_job(job_id):
+    applicants = [row for row in forms_repo.by_group(job_id) if isinstance(row.get("resume"), str)]
+    if not applicants:
+        return jsonify({"status": "error", "message": f"No applicants found for Job ID {job_id}"}), 404
+
+    items = [(row["form_id"], f"{UPLOAD_FOLDER}/{row['resume']}") for row in applicants]
+    ndjson = request.args.get("format") == "ndjson"
+
+    # Resumes are emitted as they are extracted so large jobs stream
+    # instead of waiting for every file.
+    def generate():
+        if ndjson:
+            for form_id, text in resume_texts.iter_texts(items):
+                yield json.dumps({"form_id": form_id, "text": text}) + "\n"
+            return
+        yield f'{{"status": "success", "job_id": {json.dumps(job_id)}, "resumes": {{'
+        for i, (form_id, text) in enumerate(resume_texts.iter_texts(items)):
+            yield ("" if i == 0 else ", ") + f"{json.dumps(form_id)}: {json.dumps(text)}"
+        yield "}}"
+
+    mimetype = "application/x-ndjson" if ndjson else "application/json"
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
+@app.route('/api/resume-records/<job_id>', methods=['GET'])
+def get_resume_records(job_id):
+    applicants = forms_repo.by_group(job_id)
+    if not applicants:
+        return jsonify({"status": "error", "message": f"No applicants found for Job ID {job_id}"}), 404
+
+    include_text = request.args.get("include_text") == "1"
+    records = []
+    for row in applicants:
+        record = resume_ingestor.get_record(row["form_id"])
+        if record is None:
+            records.append({"form_id": row["form_id"], "name": row["name"], "status": "pending"})
+            continue
+        records.append({
             "form_id": row["form_id"],
             "name": row["name"],
             "email": row["email"],
-            "phone": row["phone_number"],
-            "resume_file": row["resume"],
-            "applied_on": row["form_date"].strftime("%Y-%m-%d")
+            "status": "ready",
+            "skills": record["skills"],
+            "years_experience": record["years_experience"],
+            **({"text": record["text"]} if include_text else {})
         })
 
-    return jsonify({"job_id": job_id, "applicants": applicants})
+    return jsonify({"status": "success", "job_id": job_id, "records": records})
+
+
+@app.route('/api/match/<job_id>', methods=['GET'])
+def match_applicants(job_id):
+    job = jobs_repo.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": f"Job ID '{job_id}' not found."}), 404
+
+    rows = forms_repo.by_group(job_id)
+    if not rows:
+        return jsonify({"status": "error", "message": f"No applicants found for Job ID {job_id}"}), 404
+
+    # Prefer the records built at upload time; extract text for the rest.
+    applicants = {}
+    missing = []
+    for row in rows:
+        record = resume_ingestor.get_record(row["form_id"])
+        if record:
+            applicants[row["form_id"]] = {**record, "name": row["name"], "email": row["email"]}
+        elif isinstance(row.get("resume"), str):
+            missing.append(row)
+    by_form_id = {row["form_id"]: row for row in missing}
+    items = [(row["form_id"], f"{UPLOAD_FOLDER}/{row['resume']}") for row in missing]
+    for form_id, text in resume_texts.iter_texts(items):
+        row = by_form_id[form_id]
+        applicants[form_id] = {"form_id": form_id, "text": text, "name": row["name"], "email": row["email"]}
+
+    ordered = [applicants[row["form_id"]] for row in rows if row["form_id"] in applicants]
+    index = get_match_engine().index_for(job_id, job["job_description"], ordered)
+    top_k = request.args.get("top_k", default=10, type=int)
+
+    return jsonify({
+        "status": "success",
+        "job_id": job_id,
+        "total_applicants": len(ordered),
+        "job_skills": index.jd_skills,
+        "shortlist": index.rank(top_k)
+    })
 
 
 @app.route('/send-email', methods=['POST'])
@@ -340,23 +924,55 @@ def send_email():
         return jsonify({"status": "error", "message": "Missing required fields."}), 400
 
     try:
-        msg = MIMEText(body, "plain")
-        msg["Subject"] = subject
-        msg["From"] = EMAIL_USERNAME
-        msg["To"] = recipient
-
-        server = smtplib.SMTP(EMAIL_HOST, EMAIL_PORT)
-        server.starttls()
-        server.login(EMAIL_USERNAME, EMAIL_PASSWORD)
-        server.sendmail(EMAIL_USERNAME, [recipient], msg.as_string())
-        server.quit()
+        message_id = task_queue.enqueue("send_email", {"recipient_email": recipient, "subject": subject,
+                                                       "body": body})
 
-        return jsonify({"status": "success", "message": f"Email sent to {recipient}."})
+        return jsonify({"status": "success", "message": f"Email to {recipient} queued for delivery.",
+                        "message_id": message_id, "status_url": url_for("get_task", task_id=message_id)}), 202
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@app.route('/send-bulk-email', methods=['POST'])
+def send_bulk_email():
+    data = request.get_json()
+    messages = (data or {}).get("messages") or []
+
+    if not messages or any(not m.get("recipient_email") or not m.get("subject") or not m.get("body")
+                           for m in messages):
+        return jsonify({"status": "error",
+                        "message": "'messages' must be a list of {recipient_email, subject, body}."}), 400
+
+    # Bulk mail yields to single sends and payslips
+    payloads = [{"recipient_email": m["recipient_email"], "subject": m["subject"], "body": m["body"]}
+                for m in messages]
+    message_ids = task_queue.enqueue_many("send_email", payloads, priority=LOW)
+    queued = [{"recipient_email": m["recipient_email"], "message_id": message_id}
+              for m, message_id in zip(messages, message_ids)]
+
+    return jsonify({"status": "success", "message": f"{len(queued)} emails queued for delivery.",
+                    "queued": queued}), 202
+
+
+@app.route('/api/mail/<message_id>', methods=['GET'])
+def get_mail_status(message_id):
+    task = task_queue.status(message_id)
+    if task is None or task["name"] != "send_email":
+        return jsonify({"status": "error", "message": f"Message '{message_id}' not found."}), 404
+    state = task["status"]
+    if state == "queued" and task["attempts"]:
+        state = "retrying"
+    status = {"status": {"completed": "sent"}.get(state, state), "attempts": task["attempts"],
+              "error": task["error"]}
+    return jsonify({"status": "success", "message_id": message_id, "delivery": status})
+
+
+@app.route('/api/mail-stats', methods=['GET'])
+def get_mail_stats():
+    return jsonify({"status": "success", "mail": {**task_queue.counts("send_email"), "pool": dict(smtp_pool.stats)}})
+
+
 @app.route('/schedule-zoom-meeting', methods=['POST'])
 def schedule_zoom_meeting():
     data = request.get_json()
@@ -392,12 +1008,13 @@ def delete_job_post():
     if not job_id:
         return jsonify({"status": "error", "message": "Missing job_id"}), 400
 
-    df = load_jobs_df()
-    if job_id not in df['job_id'].values:
+    if not jobs_repo.exists(job_id):
         return jsonify({"status": "error", "message": f"Job ID '{job_id}' not found."}), 404
 
-    df = df[df['job_id'] != job_id]
-    save_jobs_df(df)
+    jobs_repo.delete(job_id)
+    jd_cache.invalidate(job_id)
+    job_search.remove(job_id)
+    page_cache.invalidate()
 
     return jsonify({"status": "success", "message": f"Job ID '{job_id}' deleted successfully."})
 
@@ -410,13 +1027,11 @@ def get_employee_by_id_post():
     if not emp_id:
         return jsonify({"status": "error", "message": "Missing emp_id"}), 400
 
-    df = load_employee_df()
-    row = df[df['emp_id'] == emp_id]
+    employee = employees_repo.get(emp_id)
 
-    if row.empty:
+    if employee is None:
         return jsonify({"status": "error", "message": f"Employee ID '{emp_id}' not found"}), 404
 
-    employee = row.iloc[0]
     return jsonify({
         "status": "success",
         "employee": {
@@ -429,6 +1044,73 @@ def get_employee_by_id_post():
     })
 
 
+def upload_payslip(filename, body):
+    key = f"salary_slips/{filename}"
+    response = cos.put_object(Bucket=COS_BUCKET_NAME, Key=key, Body=body)
+    payslip_catalog.add(key)
+    return response
+
+
+def payslip_url(key):
+    return f"https://{COS_BUCKET_NAME}.s3.eu-gb.cloud-object-storage.appdomain.cloud/{key}"
+
+
+def _slip_taken(recorded, slip_id, emp_id):
+    if "slip_id" not in recorded.columns:
+        return False
+    rows = recorded[recorded["slip_id"] == slip_id]
+    return not rows.empty and not (rows["emp_id"].astype(str) == str(emp_id)).any()
+
+
+def _generate_payslip(emp_id, gross_salary, slip_id=None):
+    """Render, upload and record one payslip and return the route's result
+    fields. Raises LookupError for an unknown employee. A background task
+    passes the ``slip_id`` it reserved, so a retry does not record it twice."""
+    # reportlab is only loaded by the payslip routes
+    from payslips import build_slip, render_payslip_buffer, slip_filename, slip_record
+
+    # Warm the slips log while the employee table is read
+    slips_ready = storage.submit(slips_log.read)
+
+    # Load employee details
+    employee = employees_repo.get(emp_id)
+
+    if employee is None:
+        raise LookupError(f"Employee ID '{emp_id}' not found.")
+
+    employee_name = employee["employee_name"]
+
+    if slip_id and _slip_taken(slips_ready.result(), slip_id, emp_id):
+        # A reissued id (see id_allocator) now names another employee's slip.
+        raise RuntimeError(f"Slip ID '{slip_id}' was recorded for another employee.")
+
+    # Generate slip ID in SP001 format
+    slip_id = slip_id or id_allocator.next_id("SP")
+    slip_date = datetime.now().date()
+    slip = build_slip(slip_id, emp_id, employee_name, gross_salary, slip_date)
+    filename = slip_filename(slip)
+
+    # Render the PDF and upload it to IBM COS, appending the metadata to
+    # salary_slips.csv alongside it
+    with metrics.span("pdf_render_seconds"):
+        pdf = render_payslip_buffer(slip)
+    upload = storage.submit(upload_payslip, filename, pdf)
+    try:
+        recorded = slips_ready.result()
+        if "slip_id" not in recorded.columns or not (recorded["slip_id"] == slip_id).any():
+            record_slips([slip_record(slip)])
+    except Exception as metadata_error:
+        print(f"[WARN] Salary slip metadata not saved: {metadata_error}")
+    upload.result()
+
+    return {
+        "slip_id": slip_id,
+        "net_salary": slip["net_salary"],
+        "month": slip_date.strftime("%B"),
+        "file_name": filename
+    }
+
+
 @app.route('/generate-payslip', methods=['POST'])
 def generate_payslip():
     data = request.get_json()
@@ -439,130 +1121,193 @@ def generate_payslip():
         return jsonify({"status": "error", "message": "emp_id and gross_salary are required."}), 400
 
     try:
-        # Load employee details
-        df = read_csv_from_cos("employee_details.csv")
-        emp_row = df[df["emp_id"] == emp_id]
+        if data.get("background"):
+            if not employees_repo.exists(emp_id):
+                return jsonify({"status": "error", "message": f"Employee ID '{emp_id}' not found."}), 404
+            slip_id = id_allocator.next_id("SP")
+            task_id = task_queue.enqueue("generate_payslip", {"emp_id": emp_id, "gross_salary": gross_salary,
+                                                              "slip_id": slip_id}, priority=HIGH)
+            return jsonify({
+                "status": "success",
+                "message": "Payslip generation queued.",
+                "slip_id": slip_id,
+                "task_id": task_id,
+                "status_url": url_for("get_task", task_id=task_id)
+            }), 202
 
-        if emp_row.empty:
-            return jsonify({"status": "error", "message": f"Employee ID '{emp_id}' not found."}), 404
+        result = _generate_payslip(emp_id, gross_salary)
+        return jsonify({"status": "success", "message": "Payslip generated and uploaded successfully.", **result})
 
-        employee_name = emp_row.iloc[0]["employee_name"]
-
-        # Generate slip ID in SP001 format
-        slip_csv_df = read_csv_from_cos("salary_slips.csv")
-        next_slip_num = len(slip_csv_df) + 1
-        slip_id = f"SP{str(next_slip_num).zfill(3)}"
-
-        slip_date = datetime.now().date()
-        month_str = slip_date.strftime("%B")
-
-        # Salary calculations
-        tax_percent = 10
-        pf_percent = 5
-        tax = round(gross_salary * tax_percent / 100, 2)
-        pf = round(gross_salary * pf_percent / 100, 2)
-        net_salary = round(gross_salary - tax - pf, 2)
-
-        # PDF Generation
-        filename = f"{emp_id}_{month_str}_Payslip.pdf"
-        filepath = os.path.join("salary_slips", filename)
-        os.makedirs("salary_slips", exist_ok=True)
-
-        c = canvas.Canvas(filepath, pagesize=A4)
-        width, height = A4
-
-        # Company logo and name side-by-side
-        logo_path = os.path.join("static", "statslogo.png")
-        if os.path.exists(logo_path):
-            logo = ImageReader(logo_path)
-            c.drawImage(logo, 40, height - 90, width=40, height=30, mask='auto')
-
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(100, height - 75, "STATSCOG Labs PVT LTD")  # Positioned next to logo
-
-        # Bolded slip month and year
-        c.setFont("Helvetica-Bold", 11)
-        c.drawString(40, height - 120, f"Payslip for {month_str}, {slip_date.year}")
-        c.line(40, height - 125, width - 40, height - 125)
-
-        # Build table data
-        table_data = [
-            ["Payslip ID", slip_id],
-            ["Employee ID", emp_id],
-            ["Employee Name", employee_name],
-            ["Gross Salary", f"{gross_salary:.2f}"],
-            ["Tax (10%)", f"{tax:.2f}"],
-            ["PF (5%)", f"{pf:.2f}"],
-            ["Net Salary", f"{net_salary:.2f}"],
-            ["Slip Date", slip_date.strftime("%Y-%m-%d")]
-        ]
-
-        table = Table(table_data, colWidths=[2.5 * inch, 3.5 * inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 11),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('LEFTPADDING', (0, 0), (-1, -1), 8),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-        ]))
-
-        table.wrapOn(c, width, height)
-        table.drawOn(c, 40, height - 400)
-
-        c.setFont("Helvetica-Oblique", 9)
-        c.drawString(40, 60, "Note: This is an electronically generated payslip and does not require signature.")
-        c.showPage()
-        c.save()
-
-        # Upload the PDF to IBM COS
-        with open(filepath, "rb") as file_data:
-            cos.put_object(
-                Bucket=COS_BUCKET_NAME,
-                Key=f"salary_slips/{filename}",
-                Body=file_data
-            )
-        os.remove(filepath)
-
-        # Append metadata to salary_slips.csv in COS
-        try:
-            # Try to read existing salary_slips.csv, else start fresh
-            try:
-                slip_csv_df = read_csv_from_cos("salary_slips.csv")
-            except:
-                slip_csv_df = pd.DataFrame(
-                    columns=["slip_id", "emp_id", "gross_salary", "tax", "pf", "net_salary", "slip_date"])
+    except LookupError as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
 
-            new_row = {
-                "slip_id": slip_id,
-                "emp_id": emp_id,
-                "gross_salary": gross_salary,
-                "tax": tax,
-                "pf": pf,
-                "net_salary": net_salary,
-                "slip_date": slip_date.strftime("%Y-%m-%d")
-            }
 
-            updated_df = pd.concat([slip_csv_df, pd.DataFrame([new_row])], ignore_index=True)
-            write_csv_to_cos("salary_slips.csv", updated_df)
+def record_slips(rows):
+    """Append slip rows to salary_slips and fold them into the analytics."""
+    df = slips_log.append_many(rows)
+    payroll_analytics.add(rows)
+    return df
 
-        except Exception as metadata_error:
-            print(f"[WARN] Salary slip metadata not saved: {metadata_error}")
 
-        return jsonify({
-            "status": "success",
-            "message": "Payslip generated and uploaded successfully.",
-            "slip_id": slip_id,
-            "net_salary": net_salary,
-            "month": month_str,
-            "file_name": filename
-        })
+def _payroll_dependencies():
+    return {
+        "lookup_employee": employees_repo.get,
+        "allocate_ids": lambda count: id_allocator.next_ids("SP", count),
+        "upload_pdf": upload_payslip,
+        "record_slips": record_slips,
+    }
 
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+
+def _payroll_entries(data):
+    if data.get("all"):
+        gross_salary = data.get("gross_salary")
+        if gross_salary is None:
+            return None
+        return [{"emp_id": emp_id, "gross_salary": gross_salary} for emp_id in employees_repo.keys()]
+    entries = data.get("employees") or []
+    if any(not e.get("emp_id") or e.get("gross_salary") is None for e in entries):
+        return None
+    return entries
+
+
+@app.route('/api/payroll/run', methods=['POST'])
+def start_payroll_run():
+    import payroll
+
+    data = request.get_json()
+    entries = _payroll_entries(data or {})
+
+    if not entries:
+        return jsonify({"status": "error", "message": "Provide 'employees' as a list of {emp_id, gross_salary}, "
+                                                      "or 'all': true with 'gross_salary'."}), 400
+
+    run = payroll.start_run(entries, **_payroll_dependencies())
+    return jsonify({
+        "status": "success",
+        "message": f"Payroll run started for {run.total} employees.",
+        "run_id": run.run_id,
+        "status_url": url_for('get_payroll_run', run_id=run.run_id)
+    }), 202
+
+
+@app.route('/api/payroll/run/<run_id>', methods=['GET'])
+def get_payroll_run(run_id):
+    import payroll
+
+    run = payroll.get_run(run_id)
+    if run is None:
+        return jsonify({"status": "error", "message": f"Payroll run '{run_id}' not found."}), 404
+    return jsonify({"status": "success", "run": run.to_dict()})
+
+
+def _send_mail(recipient_email, subject, body, sender_email=None):
+    """Send one plain-text email from the HR account, or from
+    ``sender_email`` (signed in with the HR password)."""
+    sender_email = sender_email or EMAIL_USERNAME
+    msg = MIMEText(body, "plain")
+    msg["Subject"] = subject
+    msg["From"] = sender_email
+    msg["To"] = recipient_email
+    smtp_pool.send(msg, sender_email, EMAIL_PASSWORD)
+    return {"recipient_email": recipient_email}
+
+
+def _ingest_resume(form_id, job_id, resume_key, name):
+    record = resume_ingestor.ingest(form_id, job_id, resume_key)
+    if record is None:
+        # The ingestor already logged why; let the task be retried.
+        raise RuntimeError(f"Resume ingestion failed for {form_id}")
+    _index_candidate(form_id, name, record)
+    return {"skills": record["skills"], "years_experience": record["years_experience"]}
+
+
+def _compact_logs():
+    return {log.base_key: log.compact() for log in (cos_forms_log, cos_slips_log)}
+
+
+def _warm_caches():
+    """Fill this process's table, page and search caches so the first
+    visitors after a deploy do not pay for them."""
+    with app.test_request_context("/"):
+        index()
+    _sync_job_search()
+    payroll_analytics.sync()
+    return {"jobs": len(jobs_view.frame())}
+
+
+task_queue.register("generate_payslip", _generate_payslip, fatal=(LookupError,))
+task_queue.register("send_email", _send_mail, max_attempts=int(os.getenv("MAIL_MAX_ATTEMPTS", "5")),
+                    fatal=(smtplib.SMTPRecipientsRefused,))
+task_queue.register("ingest_resume", _ingest_resume)
+task_queue.register("compact_logs", _compact_logs, max_attempts=1)
+task_queue.register("warm_caches", _warm_caches, max_attempts=1)
+
+# The SQLite backend has no shards to compact.
+if TABLE_BACKEND == "cos" and TASK_COMPACT_INTERVAL:
+    task_queue.every("compact_logs", TASK_COMPACT_INTERVAL)
+task_queue.every("warm_caches", TASK_WARM_INTERVAL, shared=False)
+
+
+@app.before_request
+def _start_tasks():
+    task_queue.start()
+
+
+@app.route('/api/tasks/<task_id>', methods=['GET'])
+def get_task(task_id):
+    task = task_queue.status(task_id)
+    if task is None:
+        return jsonify({"status": "error", "message": f"Task '{task_id}' not found."}), 404
+    return jsonify({"status": "success", "task": task})
+
+
+@app.route('/api/task-stats', methods=['GET'])
+def get_task_stats():
+    return jsonify({"status": "success", "tasks": task_queue.snapshot()})
+
+
+def _table_cache_stats():
+    stats = dict(table_cache.stats)
+    stats["downloads"] = stats["misses"] + stats["revalidations"] - stats["not_modified"]
+    return stats
+
+
+metrics.register_stats("table_cache", _table_cache_stats, hits=("hits", "not_modified", "coalesced"),
+                       misses=("downloads",))
+metrics.register_stats("sqlite_tables", lambda: table_store.stats, hits=("hits",), misses=("reloads",))
+metrics.register_stats("page_cache", lambda: page_cache.stats, hits=("hits", "revalidated"), misses=("misses",))
+metrics.register_stats("jd_cache", lambda: jd_cache.stats, hits=("hits",), misses=("misses",))
+metrics.register_stats("resume_text", lambda: resume_texts.stats, hits=("memory_hits", "stored_hits"),
+                       misses=("parsed",))
+metrics.register_stats("match_index", lambda: _match_engine.stats if _match_engine else {},
+                       hits=("reused",), misses=("builds",))
+metrics.register_stats("smtp_pool", lambda: smtp_pool.stats, hits=("reused",), misses=("connects",))
+metrics.register_stats("mail_queue", lambda: task_queue.counts("send_email"))
+metrics.register_stats("job_search", lambda: {**job_search.stats, "documents": len(job_search)})
+metrics.register_stats("candidate_search", lambda: {**candidate_search.stats, "documents": len(candidate_search)})
+metrics.register_stats("resume_ingest", lambda: resume_ingestor.stats)
+metrics.register_stats("payslip_catalog", lambda: payslip_catalog.stats)
+metrics.register_stats("payroll_analytics", lambda: payroll_analytics.stats)
+metrics.register_stats("tasks", task_queue.snapshot)
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/debug/profile', methods=['GET'])
+def get_profile():
+    if profiler is None:
+        return jsonify({"status": "error", "message": "Profiler is off; set PROFILER_INTERVAL to enable it."}), 404
+    return Response(profiler.folded(), mimetype="text/plain")
+
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify({"status": "success", "cache": table_cache.snapshot()})
 
 
 @app.route('/get-latest-payslip', methods=['POST'])
@@ -574,23 +1319,24 @@ def get_latest_payslip():
         if not emp_id:
             return jsonify({"status": "error", "message": "emp_id is required"}), 400
 
-        # List objects in salary_slips folder
-        response = cos.list_objects_v2(Bucket=COS_BUCKET_NAME, Prefix="salary_slips/")
-        files = response.get("Contents", [])
-
-        # Filter files matching emp_id in the filename
-        matching_files = [f for f in files if f['Key'].startswith(f'salary_slips/{emp_id}_') and f['Key'].endswith('.pdf')]
-
-        if not matching_files:
+        # The newest salary_slips row names the PDF; the upload time is only a
+        # fallback for slips that have no row.
+        latest = None
+        slip = payroll_analytics.latest(emp_id)
+        if slip is not None:
+            filename = _slip_pdf_name(slip)
+            latest = next((pdf for pdf in payslip_catalog.history(emp_id) if pdf["filename"] == filename), None)
+        if latest is None:
+            latest = payslip_catalog.latest(emp_id)
+
+        if latest is None:
             return jsonify({"status": "error", "message": f"No payslip found for {emp_id}"}), 404
 
-        # Pick the latest one
-        latest_file = max(matching_files, key=lambda f: f['LastModified'])
-        latest_key = latest_file['Key']
-        filename = latest_key.split("/")[-1]
+        latest_key = latest['key']
+        filename = latest['filename']
 
         # Construct public URL (as per your example)
-        public_url = f"https://{COS_BUCKET_NAME}.s3.eu-gb.cloud-object-storage.appdomain.cloud/{latest_key}"
+        public_url = payslip_url(latest_key)
 
         return jsonify({
             "status": "success",
@@ -603,6 +1349,70 @@ def get_latest_payslip():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+def _slip_pdf_name(slip):
+    """PDF filename of an analytics slip row (``payslips.slip_filename``)."""
+    from payslips import slip_filename
+    if not slip["slip_date"]:
+        return None
+    return slip_filename({"emp_id": slip["emp_id"], "slip_date": datetime.strptime(slip["slip_date"], "%Y-%m-%d")})
+
+
+def _payroll_year():
+    year = request.args.get("year") or str(datetime.now().year)
+    return year if year.isdigit() and len(year) == 4 else None
+
+
+@app.route('/api/payslips/<emp_id>', methods=['GET'])
+def get_payslip_history(emp_id):
+    year = _payroll_year()
+    if year is None:
+        return jsonify({"status": "error", "message": "year must be YYYY"}), 400
+
+    rows, year_to_date = payroll_analytics.employee(emp_id, year)
+    pdfs = {pdf["filename"]: pdf for pdf in payslip_catalog.history(emp_id)}
+    if not rows and not pdfs:
+        return jsonify({"status": "error", "message": f"No payslip found for {emp_id}"}), 404
+
+    def pdf_fields(pdf):
+        return {
+            "filename": pdf["filename"],
+            "month": pdf["month"],
+            "last_modified": pd.Timestamp(pdf["last_modified"]).isoformat(),
+            "download_url": payslip_url(pdf["key"])
+        }
+
+    payslips = []
+    for slip in rows:
+        entry = {key: slip[key] for key in ("slip_id", "slip_date", "gross_salary", "tax", "pf", "net_salary")}
+        # A month's PDF is overwritten by later slips, so only the newest
+        # slip for a filename links to it.
+        filename = _slip_pdf_name(slip)
+        pdf = pdfs.pop(filename, None)
+        if pdf is not None:
+            entry.update(pdf_fields(pdf))
+        else:
+            entry.update(filename=filename, month=filename and filename.rsplit("_", 2)[1])
+        payslips.append(entry)
+    # PDFs without a salary_slips row
+    payslips.extend(pdf_fields(pdf) for pdf in sorted(pdfs.values(), key=lambda p: p["last_modified"], reverse=True))
+
+    return jsonify({
+        "status": "success",
+        "emp_id": emp_id,
+        "year_to_date": year_to_date,
+        "payslips": payslips
+    })
+
+
+@app.route('/api/payroll/summary', methods=['GET'])
+def get_payroll_summary():
+    year = _payroll_year()
+    if year is None:
+        return jsonify({"status": "error", "message": "year must be YYYY"}), 400
+    summary = payroll_analytics.summary(year, request.args.get("department") or None)
+    return jsonify({"status": "success", **summary})
+
+
 @app.route('/send-email-to-hr', methods=['POST'])
 def send_email_to_hr():
     try:
@@ -615,32 +1425,19 @@ def send_email_to_hr():
             return jsonify({"status": "error", "message": "emp_id, subject, and message are required"}), 400
 
         # Load employee email
-        df = read_csv_from_cos("employee_details.csv")
-        emp_row = df[df["emp_id"] == emp_id]
+        employee = employees_repo.get(emp_id)
 
-        if emp_row.empty:
+        if employee is None:
             return jsonify({"status": "error", "message": f"Employee ID '{emp_id}' not found."}), 404
 
-        sender_email = emp_row.iloc[0]["email_id"]
-        sender_password = os.getenv("EMAIL_PASSWORD")  # Best practice: set this in your env or secrets vault
-        smtp_server = "webmail.4technologies.in"
-        smtp_port = 587
-        hr_email = "saad.shaik@4technologies.in"
-
-        # Create the email
-        msg = EmailMessage()
-        msg["Subject"] = subject
-        msg["From"] = sender_email
-        msg["To"] = hr_email
-        msg.set_content(message_body)
-
-        # Send the email
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
-
-        return jsonify({"status": "success", "message": f"Email sent to HR from {sender_email}"}), 200
+        sender_email = employee["email_id"]
+
+        # Queued like every other email; only the sender address is stored
+        message_id = task_queue.enqueue("send_email", {"recipient_email": HR_EMAIL, "subject": subject,
+                                                       "body": message_body, "sender_email": sender_email})
+
+        return jsonify({"status": "success", "message": f"Email to HR from {sender_email} queued for delivery.",
+                        "message_id": message_id, "status_url": url_for("get_task", task_id=message_id)}), 202
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
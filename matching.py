@@ -0,0 +1,162 @@
+"""Resume-to-JD matching.
+
+Each applicant is a row in two sparse matrices: TF-IDF over the job's
+corpus (JD + resumes) and a binary skill vector over ``skills.SKILLS``.
+Scoring every applicant is then two sparse matrix-vector products. The
+matrices are kept per job and rebuilt only when the JD text or the set of
+applicants changes.
+"""
+import hashlib
+import math
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+from scipy import sparse
+
+from skills import SKILLS, detect_skills, tokenize as _words, years_of_experience
+
+SKILL_WEIGHT = 0.6
+TEXT_WEIGHT = 0.4
+
+_SKILL_INDEX = {skill: i for i, skill in enumerate(SKILLS)}
+_nlp = None
+_nlp_loaded = False
+
+
+def _tokenizer():
+    # spaCy takes about a second to import, so it is loaded on first use.
+    global _nlp, _nlp_loaded
+    if not _nlp_loaded:
+        try:
+            import spacy
+            _nlp = spacy.blank("en")
+        except ImportError:
+            _nlp = None
+        _nlp_loaded = True
+    return _nlp
+
+
+def tokenize(text):
+    text = (text or "").lower().replace("\\n", " ")
+    nlp = _tokenizer()
+    if nlp is not None:
+        return [t.lower_ for t in nlp.make_doc(text)
+                if not (t.is_stop or t.is_punct or t.is_space or t.like_num) and len(t) > 1]
+    return [t for t in _words(text) if len(t) > 1 and not t[0].isdigit()]
+
+
+def _skill_matrix(skill_lists):
+    rows, cols = [], []
+    for row, skills in enumerate(skill_lists):
+        for skill in skills:
+            rows.append(row)
+            cols.append(_SKILL_INDEX[skill])
+    data = np.ones(len(rows), dtype=np.float32)
+    return sparse.csr_matrix((data, (rows, cols)), shape=(len(skill_lists), len(_SKILL_INDEX)))
+
+
+def _tfidf_matrix(documents):
+    """L2-normalised TF-IDF rows for ``documents`` (lists of tokens)."""
+    counts = [Counter(doc) for doc in documents]
+    vocabulary = {}
+    for counter in counts:
+        for term in counter:
+            vocabulary.setdefault(term, len(vocabulary))
+    document_frequency = np.zeros(len(vocabulary), dtype=np.float32)
+    rows, cols, data = [], [], []
+    for row, counter in enumerate(counts):
+        for term, count in counter.items():
+            col = vocabulary[term]
+            document_frequency[col] += 1
+            rows.append(row)
+            cols.append(col)
+            data.append(1 + math.log(count))
+    matrix = sparse.csr_matrix((np.array(data, dtype=np.float32), (rows, cols)),
+                               shape=(len(documents), len(vocabulary)))
+    idf = np.log((1 + len(documents)) / (1 + document_frequency)) + 1
+    matrix = matrix.multiply(idf).tocsr()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix
+
+
+class JobMatchIndex:
+
+    def __init__(self, jd_text, applicants):
+        """``applicants`` is a list of dicts with form_id, text and optionally
+        skills / years_experience (as stored by resume ingestion)."""
+        self.form_ids = [a["form_id"] for a in applicants]
+        self.applicants = applicants
+        self.jd_skills = detect_skills(jd_text)
+        self.applicant_skills = [a.get("skills") or detect_skills(a.get("text", "")) for a in applicants]
+
+        tfidf = _tfidf_matrix([tokenize(jd_text)] + [tokenize(a.get("text", "")) for a in applicants])
+        self.jd_vector = tfidf[0].T
+        self.resume_matrix = tfidf[1:]
+        self.skill_matrix = _skill_matrix(self.applicant_skills)
+        self.jd_skill_vector = _skill_matrix([self.jd_skills])[0].T
+
+    def scores(self):
+        text_scores = np.asarray((self.resume_matrix @ self.jd_vector).todense()).ravel()
+        if not self.jd_skills:
+            return text_scores, np.zeros_like(text_scores), text_scores
+        overlap = np.asarray((self.skill_matrix @ self.jd_skill_vector).todense()).ravel()
+        skill_scores = overlap / len(self.jd_skills)
+        return text_scores, skill_scores, SKILL_WEIGHT * skill_scores + TEXT_WEIGHT * text_scores
+
+    def rank(self, top_k=None):
+        if not self.form_ids:
+            return []
+        text_scores, skill_scores, combined = self.scores()
+        order = np.argsort(-combined, kind="stable")
+        if top_k:
+            order = order[:top_k]
+        jd_skills = set(self.jd_skills)
+        results = []
+        for i in order:
+            applicant = self.applicants[i]
+            skills = set(self.applicant_skills[i])
+            years = applicant.get("years_experience")
+            if years is None and applicant.get("text"):
+                years = years_of_experience(applicant["text"])
+            results.append({
+                "form_id": self.form_ids[i],
+                "name": applicant.get("name"),
+                "email": applicant.get("email"),
+                "score": round(float(combined[i]) * 100, 1),
+                "skill_score": round(float(skill_scores[i]) * 100, 1),
+                "text_score": round(float(text_scores[i]) * 100, 1),
+                "matched_skills": sorted(skills & jd_skills),
+                "missing_skills": sorted(jd_skills - skills),
+                "years_experience": years,
+            })
+        return results
+
+
+class MatchEngine:
+
+    def __init__(self, max_jobs=128):
+        self.max_jobs = max_jobs
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"builds": 0, "reused": 0}
+
+    def index_for(self, job_id, jd_text, applicants):
+        signature = hashlib.sha1(
+            "\x1f".join([jd_text or ""] + [f"{a['form_id']}:{len(a.get('text', ''))}" for a in applicants])
+            .encode("utf-8")
+        ).hexdigest()
+        with self._lock:
+            cached = self._indexes.get(job_id)
+            if cached and cached[0] == signature:
+                self._indexes.move_to_end(job_id)
+                self.stats["reused"] += 1
+                return cached[1]
+        index = JobMatchIndex(jd_text, applicants)
+        with self._lock:
+            self.stats["builds"] += 1
+            self._indexes[job_id] = (signature, index)
+            while len(self._indexes) > self.max_jobs:
+                self._indexes.popitem(last=False)
+        return index
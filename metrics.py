@@ -0,0 +1,302 @@
+"""Timings, counters and a sampling profiler, exported in Prometheus text
+format.
+
+``registry.span(name, **labels)`` times a block into a summary (p50/p95/p99
+over the last ``WINDOW`` observations, plus _sum and _count). The Flask app
+is timed per route by ``instrument_app``, and the COS client per operation
+by ``InstrumentedClient``, which also counts bytes sent and received.
+Components that already keep a ``stats`` dict (caches, queues) are exported
+through ``register_stats``, with a hit ratio where they have hits/misses.
+
+Setting ``PROFILER_INTERVAL`` (seconds, e.g. 0.01) starts a thread that
+samples every thread's stack; ``SamplingProfiler.folded`` renders the
+samples as folded stacks for flamegraph tools.
+"""
+import io
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from functools import wraps
+
+NAMESPACE = "hr"
+WINDOW = int(os.getenv("METRICS_WINDOW", "2048"))
+QUANTILES = (0.5, 0.95, 0.99)
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0"))
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    return repr(float(value))
+
+
+class Summary:
+
+    def __init__(self, window=WINDOW):
+        self._values = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self._values.append(value)
+        self.count += 1
+        self.total += value
+
+    def quantiles(self):
+        values = sorted(self._values)
+        if not values:
+            return {q: None for q in QUANTILES}
+        return {q: values[int(q * (len(values) - 1))] for q in QUANTILES}
+
+
+class Registry:
+
+    def __init__(self, namespace=NAMESPACE):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._summaries = {}
+        self._help = {}
+        self._stats = []
+
+    def _name(self, name):
+        return f"{self.namespace}_{name}"
+
+    def describe(self, name, text):
+        self._help[self._name(name)] = text
+
+    def inc(self, name, value=1, **labels):
+        key = (self._name(name), _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (self._name(name), _label_key(labels))
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = Summary()
+            summary.observe(seconds)
+
+    @contextmanager
+    def span(self, name, **labels):
+        """Time the enclosed block into summary ``name``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def register_stats(self, component, get_stats, hits=(), misses=()):
+        """Export the numeric entries of ``get_stats()`` as
+        ``component_events_total{component,event}`` and, when ``hits`` and
+        ``misses`` name stat keys, a ``cache_hit_ratio`` gauge."""
+        self._stats.append((component, get_stats, tuple(hits), tuple(misses)))
+
+    def _stat_lines(self):
+        events, ratios = [], []
+        for component, get_stats, hits, misses in self._stats:
+            try:
+                stats = get_stats()
+            except Exception as e:
+                print(f"[WARN] Metrics for {component} unavailable: {e}")
+                continue
+            for event, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    events.append(((("component", component), ("event", event)), value))
+            if hits:
+                hit_count = sum(stats.get(k, 0) for k in hits)
+                total = hit_count + sum(stats.get(k, 0) for k in misses)
+                ratios.append(((("cache", component),), hit_count / total if total else None))
+        return events, ratios
+
+    def render(self):
+        """All metrics in Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self._counters)
+            summaries = {key: (s.quantiles(), s.total, s.count) for key, s in self._summaries.items()}
+        out = io.StringIO()
+
+        def header(name, kind):
+            if name in self._help:
+                out.write(f"# HELP {name} {self._help[name]}\n")
+            out.write(f"# TYPE {name} {kind}\n")
+
+        for name in sorted({name for name, _ in counters}):
+            header(name, "counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    out.write(f"{name}{_format_labels(labels)} {_format_value(value)}\n")
+
+        for name in sorted({name for name, _ in summaries}):
+            header(name, "summary")
+            for (metric, labels), (quantiles, total, count) in sorted(summaries.items()):
+                if metric != name:
+                    continue
+                for q, value in quantiles.items():
+                    out.write(f"{name}{_format_labels(labels, [('quantile', q)])} {_format_value(value)}\n")
+                out.write(f"{name}_sum{_format_labels(labels)} {_format_value(total)}\n")
+                out.write(f"{name}_count{_format_labels(labels)} {count}\n")
+
+        events, ratios = self._stat_lines()
+        if events:
+            name = self._name("component_events_total")
+            header(name, "counter")
+            for labels, value in events:
+                out.write(f"{name}{_format_labels(labels)} {_format_value(value)}\n")
+        if ratios:
+            name = self._name("cache_hit_ratio")
+            header(name, "gauge")
+            for labels, value in ratios:
+                out.write(f"{name}{_format_labels(labels)} {_format_value(value)}\n")
+        return out.getvalue()
+
+
+registry = Registry()
+registry.describe("http_request_duration_seconds", "Flask request latency by route, method and status.")
+registry.describe("cos_request_duration_seconds", "COS client call latency by operation.")
+registry.describe("cos_errors_total", "COS client calls that raised, by operation.")
+registry.describe("cos_bytes_sent_total", "Bytes uploaded to COS.")
+registry.describe("cos_bytes_received_total", "Bytes downloaded from COS.")
+registry.describe("table_read_seconds", "Table reads through the table cache, by table.")
+registry.describe("table_write_seconds", "Table writes to COS, by table.")
+registry.describe("pdf_render_seconds", "Payslip PDF rendering in request handlers.")
+registry.describe("smtp_connect_seconds", "SMTP connect, STARTTLS and login.")
+registry.describe("smtp_send_seconds", "SMTP message sends on a pooled connection.")
+registry.describe("task_queue_seconds", "Time background tasks waited between becoming due and starting, by task.")
+registry.describe("task_run_seconds", "Background task run time, by task.")
+registry.describe("tasks_total", "Background task events (enqueued, completed, retried, failed, lost, periodic), by task.")
+
+
+def instrument_app(app, registry=registry):
+    """Time every request by its route pattern."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_timing(response):
+        started = getattr(g, "_metrics_started", None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            registry.observe("http_request_duration_seconds", time.perf_counter() - started,
+                             route=route, method=request.method, status=response.status_code)
+        return response
+
+    return app
+
+
+def _body_size(body):
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        return len(body)
+    if isinstance(body, str):
+        return len(body.encode("utf-8"))
+    if isinstance(body, io.BytesIO):
+        return body.getbuffer().nbytes
+    return 0
+
+
+class InstrumentedClient:
+    """Proxy around a COS client that times each call by operation."""
+
+    def __init__(self, client, registry=registry):
+        self._client = client
+        self._registry = registry
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        @wraps(attr)
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                response = attr(*args, **kwargs)
+            except Exception as e:
+                # A 304 on a conditional GET is a cache hit, not an error.
+                status = getattr(e, "response", {}).get("ResponseMetadata", {}).get("HTTPStatusCode")
+                if status != 304:
+                    self._registry.inc("cos_errors_total", operation=name)
+                raise
+            finally:
+                self._registry.observe("cos_request_duration_seconds", time.perf_counter() - started, operation=name)
+            if name == "put_object":
+                self._registry.inc("cos_bytes_sent_total", _body_size(kwargs.get("Body")), operation=name)
+            elif name == "upload_fileobj":
+                fileobj = kwargs.get("Fileobj", args[0] if args else None)
+                self._registry.inc("cos_bytes_sent_total", _body_size(fileobj), operation=name)
+            elif name == "get_object" and isinstance(response, dict):
+                self._registry.inc("cos_bytes_received_total", response.get("ContentLength") or 0, operation=name)
+            return response
+
+        return call
+
+
+class SamplingProfiler:
+
+    def __init__(self, interval, max_stacks=20000):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.samples = Counter()
+        self.started_at = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        # After a fork the parent's sampler thread is gone; start a new one.
+        if self._thread is None or not self._thread.is_alive():
+            self._stop = threading.Event()
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                with self._lock:
+                    if key in self.samples or len(self.samples) < self.max_stacks:
+                        self.samples[key] += 1
+
+    def folded(self):
+        """Samples as ``frame;frame;frame count`` lines, hottest first."""
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+profiler = SamplingProfiler(PROFILER_INTERVAL).start() if PROFILER_INTERVAL > 0 else None
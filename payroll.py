@@ -0,0 +1,190 @@
+"""Batch payroll runs.
+
+A run renders every payslip across a process pool, uploads the PDFs from
+a thread pool as they come back, and then records all slip rows in a
+single write. Runs execute on a background thread; their progress is
+kept in ``runs`` for the status endpoint until ``RUN_RETENTION`` seconds
+after they finish. An entry whose salary is not a number fails on its own
+without stopping the rest of the run.
+"""
+import multiprocessing
+import os
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from payslips import build_slip, render_payslip_batch, slip_filename, slip_record
+
+RENDER_WORKERS = int(os.getenv("PAYROLL_RENDER_WORKERS", str(os.cpu_count() or 2)))
+UPLOAD_WORKERS = int(os.getenv("PAYROLL_UPLOAD_WORKERS", "16"))
+RENDER_CHUNK = 25
+RUN_RETENTION = float(os.getenv("PAYROLL_RUN_RETENTION", "3600"))
+
+# forkserver keeps request-handling threads out of the render processes;
+# preloading payslips means each worker starts with reportlab imported.
+_mp_context = multiprocessing.get_context("forkserver")
+_mp_context.set_forkserver_preload(["payslips"])
+
+runs = {}
+_runs_lock = threading.Lock()
+
+
+class PayrollRun:
+
+    def __init__(self, entries):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.entries = entries
+        self.status = "queued"
+        self.total = len(entries)
+        self.rendered = 0
+        self.uploaded = 0
+        self.failed = []
+        self.slips = []
+        self.started_at = None
+        self.finished_at = None
+        self._finished = None
+        self._lock = threading.Lock()
+
+    def finish(self, status):
+        self.status = status
+        self.finished_at = datetime.now().isoformat(timespec="seconds")
+        self._finished = time.monotonic()
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "run_id": self.run_id,
+                "status": self.status,
+                "total": self.total,
+                "rendered": self.rendered,
+                "uploaded": self.uploaded,
+                "failed": list(self.failed),
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "slips": [
+                    {"emp_id": s["emp_id"], "slip_id": s["slip_id"], "file_name": slip_filename(s),
+                     "net_salary": s["net_salary"]}
+                    for s in self.slips
+                ] if self.status == "completed" else [],
+            }
+
+
+def _gross_salary(entry):
+    """``entry``'s gross salary as a float, or None when it is not a usable amount."""
+    try:
+        gross_salary = float(entry["gross_salary"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not math.isfinite(gross_salary) or gross_salary < 0:
+        return None
+    return gross_salary
+
+
+def execute_run(run, lookup_employee, allocate_ids, upload_pdf, record_slips):
+    """Run ``run`` to completion on the calling thread.
+
+    ``lookup_employee(emp_id)`` returns the employee row or None,
+    ``allocate_ids(n)`` returns n slip ids, ``upload_pdf(filename, body)``
+    stores one PDF and ``record_slips(rows)`` persists all slip rows at once.
+    """
+    run.status = "running"
+    run.started_at = datetime.now().isoformat(timespec="seconds")
+    slip_date = datetime.now().date()
+
+    slips = []
+    valid = []
+    for entry in run.entries:
+        gross_salary = _gross_salary(entry)
+        if gross_salary is None:
+            run.failed.append({"emp_id": entry.get("emp_id"),
+                               "error": f"Invalid gross_salary: {entry.get('gross_salary')!r}"})
+            continue
+        employee = lookup_employee(entry["emp_id"])
+        if employee is None:
+            run.failed.append({"emp_id": entry["emp_id"], "error": "Employee not found"})
+        else:
+            valid.append((entry, employee, gross_salary))
+    slip_ids = allocate_ids(len(valid)) if valid else []
+    for (entry, employee, gross_salary), slip_id in zip(valid, slip_ids):
+        slips.append(build_slip(slip_id, entry["emp_id"], employee["employee_name"],
+                                gross_salary, slip_date))
+    by_id = {slip["slip_id"]: slip for slip in slips}
+
+    chunks = [slips[i:i + RENDER_CHUNK] for i in range(0, len(slips), RENDER_CHUNK)]
+    uploaded = []
+    uploads = {}
+    with ProcessPoolExecutor(max_workers=max(1, min(RENDER_WORKERS, len(chunks))), mp_context=_mp_context) as renderers, \
+            ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as uploaders:
+        for rendered in as_completed([renderers.submit(render_payslip_batch, chunk) for chunk in chunks]):
+            try:
+                pdfs = rendered.result()
+            except Exception as e:
+                print(f"[WARN] Payroll render batch failed: {e}")
+                continue
+            with run._lock:
+                run.rendered += len(pdfs)
+            for slip_id, body in pdfs:
+                slip = by_id[slip_id]
+                uploads[uploaders.submit(upload_pdf, slip_filename(slip), body)] = slip
+
+        for done in as_completed(uploads):
+            slip = uploads[done]
+            try:
+                done.result()
+            except Exception as e:
+                with run._lock:
+                    run.failed.append({"emp_id": slip["emp_id"], "error": f"Upload failed: {e}"})
+                continue
+            uploaded.append(slip)
+            with run._lock:
+                run.uploaded += 1
+
+    attempted = {slip["slip_id"] for slip in uploads.values()}
+    for slip in slips:
+        if slip["slip_id"] not in attempted:
+            run.failed.append({"emp_id": slip["emp_id"], "error": "Render failed"})
+
+    uploaded.sort(key=lambda s: s["slip_id"])
+    try:
+        if uploaded:
+            record_slips([slip_record(slip) for slip in uploaded])
+        run.slips = uploaded
+        run.finish("completed")
+    except Exception as e:
+        print(f"[WARN] Payroll run {run.run_id} metadata not saved: {e}")
+        run.finish("failed")
+    return run
+
+
+def start_run(entries, **dependencies):
+    """Start a payroll run on a background thread and return it."""
+    run = PayrollRun(entries)
+    with _runs_lock:
+        _evict_finished()
+        runs[run.run_id] = run
+
+    def target():
+        try:
+            execute_run(run, **dependencies)
+        except Exception as e:
+            print(f"[WARN] Payroll run {run.run_id} failed: {e}")
+            run.finish("failed")
+
+    threading.Thread(target=target, name=f"payroll-{run.run_id}", daemon=True).start()
+    return run
+
+
+def get_run(run_id):
+    """The run with ``run_id``, or None if it is unknown or has expired."""
+    with _runs_lock:
+        _evict_finished()
+        return runs.get(run_id)
+
+
+def _evict_finished():
+    cutoff = time.monotonic() - RUN_RETENTION
+    for run_id in [r for r, run in runs.items() if run._finished is not None and run._finished < cutoff]:
+        del runs[run_id]
@@ -0,0 +1,196 @@
+"""Incrementally maintained payroll aggregates over salary_slips.
+
+``PayrollAnalytics`` folds each slip row into running totals once: per
+employee and year (year-to-date gross/tax/PF/net), per month, and per
+department and month (joined with employee_details), plus each employee's
+slip history in date order. Slips written by this process are added as
+they are recorded; ``sync`` picks up rows written elsewhere by applying
+only the slip ids it has not seen, and rebuilds from scratch only if rows
+disappeared. Department totals are re-derived from the per-employee
+monthly totals when the employee table changes, so a department move
+needs no pass over the slips. Queries read the totals directly, whatever
+the size of the slip history, and only sync when the last sync is more
+than ``PAYROLL_ANALYTICS_REFRESH`` seconds old (0 syncs on every query),
+so slips written by other processes show up within that window.
+"""
+import bisect
+import os
+import threading
+import time
+
+import pandas as pd
+
+from listing import iso_dates
+
+AMOUNTS = ("gross_salary", "tax", "pf", "net_salary")
+REFRESH_SECONDS = float(os.getenv("PAYROLL_ANALYTICS_REFRESH", "60"))
+
+
+def _totals():
+    return dict.fromkeys(AMOUNTS, 0.0) | {"slips": 0}
+
+
+def _accumulate(totals, slip):
+    for column in AMOUNTS:
+        totals[column] += slip[column]
+    totals["slips"] += 1
+
+
+def _rounded(totals):
+    return {k: round(v, 2) if isinstance(v, float) else v for k, v in totals.items()}
+
+
+class PayrollAnalytics:
+
+    def __init__(self, load_slips, load_employees, refresh=REFRESH_SECONDS):
+        self._load_slips = load_slips
+        self._load_employees = load_employees
+        self.refresh = refresh
+        self._synced_at = None
+        self._lock = threading.RLock()
+        self._slips_df = None
+        self._employees_df = None
+        self._employee_departments = {}
+        self._pending = {}
+        self._reset()
+        self.stats = {"applied": 0, "rebuilds": 0, "department_rebuilds": 0}
+
+    def _reset(self):
+        self._seen = set()
+        self._history = {}
+        self._by_employee = {}
+        self._by_employee_month = {}
+        self._by_month = {}
+        self._month_employees = {}
+        self._by_department = {}
+
+    @staticmethod
+    def _normalise(rows):
+        """Slip dicts with numeric amounts and ISO dates, from a DataFrame."""
+        rows = rows.reindex(columns=["slip_id", "emp_id", "slip_date", *AMOUNTS])
+        rows = rows.dropna(subset=["slip_id", "emp_id"])
+        rows = rows.assign(slip_id=rows["slip_id"].astype(str), emp_id=rows["emp_id"].astype(str),
+                           slip_date=iso_dates(rows["slip_date"]))
+        for column in AMOUNTS:
+            rows[column] = pd.to_numeric(rows[column], errors="coerce").fillna(0.0).astype(float)
+        return rows.to_dict("records")
+
+    def _department(self, emp_id):
+        department = self._employee_departments.get(emp_id)
+        return department if isinstance(department, str) and department else "Unassigned"
+
+    def _apply(self, slips):
+        for slip in slips:
+            if slip["slip_id"] in self._seen:
+                continue
+            self._seen.add(slip["slip_id"])
+            emp_id, date = slip["emp_id"], slip["slip_date"]
+            year, month = date[:4] or "unknown", date[:7] or "unknown"
+            history = self._history.setdefault(emp_id, [])
+            bisect.insort(history, (date, slip["slip_id"], slip))
+            _accumulate(self._by_employee.setdefault(emp_id, {}).setdefault(year, _totals()), slip)
+            _accumulate(self._by_employee_month.setdefault(emp_id, {}).setdefault(month, _totals()), slip)
+            _accumulate(self._by_month.setdefault(month, _totals()), slip)
+            self._month_employees.setdefault(month, set()).add(emp_id)
+            department = self._by_department.setdefault(self._department(emp_id), {})
+            _accumulate(department.setdefault(month, _totals()), slip)
+            self.stats["applied"] += 1
+
+    def _rebuild_departments(self, employees):
+        columns = employees.columns
+        self._employee_departments = (dict(zip(employees["emp_id"], employees["department"]))
+                                      if "emp_id" in columns and "department" in columns else {})
+        self._by_department = {}
+        for emp_id, months in self._by_employee_month.items():
+            department = self._by_department.setdefault(self._department(emp_id), {})
+            for month, totals in months.items():
+                merged = department.setdefault(month, _totals())
+                for key, value in totals.items():
+                    merged[key] += value
+        self.stats["department_rebuilds"] += 1
+
+    def sync(self):
+        """Catch up with the slips and employee tables."""
+        slips, employees = self._load_slips(), self._load_employees()
+        self._synced_at = time.monotonic()
+        with self._lock:
+            if employees is not self._employees_df:
+                self._employees_df = employees
+                self._rebuild_departments(employees)
+            if slips is self._slips_df:
+                return
+            ids = slips["slip_id"] if "slip_id" in slips.columns else pd.Series(dtype=object)
+            present = set(ids.dropna())
+            missing = self._seen - present
+            # Slips added here may not be in a table read that raced the write.
+            if missing - self._pending.keys():
+                # Rows were removed or rewritten; start over.
+                self._reset()
+                self.stats["rebuilds"] += 1
+            self._apply(self._normalise(slips[~ids.isin(self._seen)]))
+            self._apply(self._pending[slip_id] for slip_id in missing & self._pending.keys())
+            self._pending = {k: v for k, v in self._pending.items() if k not in present}
+            self._slips_df = slips
+
+    def _refresh(self):
+        synced_at = self._synced_at
+        if synced_at is None or time.monotonic() - synced_at >= self.refresh:
+            self.sync()
+
+    def add(self, rows):
+        """Fold slip rows (as written to salary_slips) into the totals."""
+        slips = self._normalise(pd.DataFrame(rows))
+        with self._lock:
+            self._pending.update((slip["slip_id"], slip) for slip in slips)
+            self._apply(slips)
+
+    def employee(self, emp_id, year):
+        """``(history, year_to_date)``: the employee's slips, newest first,
+        and their totals for ``year``."""
+        self._refresh()
+        with self._lock:
+            history = [slip for _, _, slip in reversed(self._history.get(emp_id, []))]
+            totals = self._by_employee.get(emp_id, {}).get(year, _totals())
+            return history, dict(_rounded(totals), year=year)
+
+    def latest(self, emp_id):
+        self._refresh()
+        with self._lock:
+            history = self._history.get(emp_id)
+            return history[-1][2] if history else None
+
+    def summary(self, year, department=None):
+        """Totals for ``year``: overall, by month and by department."""
+        self._refresh()
+        with self._lock:
+            months = []
+            overall = _totals()
+            employees = set()
+            for month in sorted(m for m in self._by_month if m.startswith(year)):
+                totals = self._by_month[month]
+                if department:
+                    totals = self._by_department.get(department, {}).get(month)
+                    if totals is None:
+                        continue
+                for key, value in totals.items():
+                    overall[key] += value
+                if not department:
+                    employees |= self._month_employees[month]
+                    months.append(dict(_rounded(totals), month=month, employees=len(self._month_employees[month])))
+                else:
+                    months.append(dict(_rounded(totals), month=month))
+            departments = []
+            for name in sorted(self._by_department):
+                if department and name != department:
+                    continue
+                totals = _totals()
+                for month, month_totals in self._by_department[name].items():
+                    if month.startswith(year):
+                        for key, value in month_totals.items():
+                            totals[key] += value
+                if totals["slips"]:
+                    departments.append(dict(_rounded(totals), department=name))
+            result = {"year": year, "totals": _rounded(overall), "months": months, "departments": departments}
+            if not department:
+                result["totals"]["employees"] = len(employees)
+            return result
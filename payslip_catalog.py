@@ -0,0 +1,106 @@
+"""In-memory index of the payslip PDFs under ``salary_slips/``.
+
+The catalog is built from one paginated listing of the prefix and then
+kept current by ``add`` whenever this process uploads a slip, so latest /
+history lookups never list the bucket. Slips uploaded by other processes
+are picked up when the catalog is rebuilt, every
+``PAYSLIP_CATALOG_REFRESH`` seconds (0, the default, builds it once).
+"""
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+REFRESH_SECONDS = float(os.getenv("PAYSLIP_CATALOG_REFRESH", "0"))
+
+# payslips.slip_filename: {emp_id}_{Month}_Payslip.pdf
+_SLIP_NAME = re.compile(r"^(?P<emp_id>.+)_(?P<month>[A-Za-z]+)_Payslip\.pdf$")
+
+
+def parse_slip_key(key, prefix="salary_slips/"):
+    """``(emp_id, month)`` for a payslip key, or None if it is not a PDF."""
+    filename = key[len(prefix):] if key.startswith(prefix) else key
+    if "/" in filename or not filename.endswith(".pdf"):
+        return None
+    match = _SLIP_NAME.match(filename)
+    if match:
+        return match.group("emp_id"), match.group("month")
+    if "_" in filename:
+        return filename.split("_", 1)[0], None
+    return None
+
+
+class PayslipCatalog:
+
+    def __init__(self, get_client, bucket, prefix="salary_slips/", refresh=REFRESH_SECONDS):
+        self._get_client = get_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        self._slips = None
+        self._built_at = 0
+        self.stats = {"builds": 0, "listed_pages": 0, "added": 0, "lookups": 0}
+
+    def _list(self):
+        slips = {}
+        token = None
+        while True:
+            params = {"Bucket": self.bucket, "Prefix": self.prefix}
+            if token:
+                params["ContinuationToken"] = token
+            response = self._get_client().list_objects_v2(**params)
+            self.stats["listed_pages"] += 1
+            for obj in response.get("Contents", []):
+                self._index(slips, obj["Key"], obj.get("LastModified"), obj.get("Size"))
+            if not response.get("IsTruncated"):
+                break
+            token = response["NextContinuationToken"]
+        for entries in slips.values():
+            entries.sort(key=lambda e: e["last_modified"])
+        return slips
+
+    def _index(self, slips, key, last_modified, size=None):
+        parsed = parse_slip_key(key, self.prefix)
+        if parsed is None:
+            return
+        emp_id, month = parsed
+        entries = slips.setdefault(emp_id, [])
+        # Re-generating a month overwrites the same key.
+        entries[:] = [e for e in entries if e["key"] != key]
+        entries.append({
+            "key": key,
+            "filename": key.split("/")[-1],
+            "month": month,
+            "last_modified": last_modified or datetime.now(timezone.utc),
+            "size": size
+        })
+
+    def _ensure(self):
+        if self._slips is None or (self.refresh and time.monotonic() - self._built_at >= self.refresh):
+            self._slips = self._list()
+            self._built_at = time.monotonic()
+            self.stats["builds"] += 1
+        return self._slips
+
+    def add(self, key, last_modified=None, size=None):
+        """Record a slip this process just uploaded."""
+        with self._lock:
+            if self._slips is None:
+                return
+            self._index(self._slips, key, last_modified, size)
+            self.stats["added"] += 1
+
+    def history(self, emp_id):
+        """Slips for ``emp_id``, oldest first."""
+        with self._lock:
+            self.stats["lookups"] += 1
+            return list(self._ensure().get(emp_id, []))
+
+    def latest(self, emp_id):
+        with self._lock:
+            self.stats["lookups"] += 1
+            entries = self._ensure().get(emp_id)
+            return entries[-1] if entries else None
+
@@ -0,0 +1,173 @@
+"""Payslip calculation and PDF rendering shared by the single-slip route
+and batch payroll runs. Everything here is picklable so it can run in a
+process pool."""
+import io
+import os
+
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import Table, TableStyle
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+TAX_PERCENT = 10
+PF_PERCENT = 5
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "statslogo.png")
+
+# Write streams as binary rather than ASCII85 text; reportlab's pure-Python
+# ASCII85 encoder is otherwise most of the cost of a slip.
+rl_config.useA85 = 0
+
+
+def build_slip(slip_id, emp_id, employee_name, gross_salary, slip_date):
+    tax = round(gross_salary * TAX_PERCENT / 100, 2)
+    pf = round(gross_salary * PF_PERCENT / 100, 2)
+    return {
+        "slip_id": slip_id,
+        "emp_id": emp_id,
+        "employee_name": employee_name,
+        "gross_salary": gross_salary,
+        "tax": tax,
+        "pf": pf,
+        "net_salary": round(gross_salary - tax - pf, 2),
+        "slip_date": slip_date,
+    }
+
+
+def slip_filename(slip):
+    return f"{slip['emp_id']}_{slip['slip_date'].strftime('%B')}_Payslip.pdf"
+
+
+def slip_record(slip):
+    """Row stored in salary_slips.csv for ``slip``."""
+    return {
+        "slip_id": slip["slip_id"],
+        "emp_id": slip["emp_id"],
+        "gross_salary": slip["gross_salary"],
+        "tax": slip["tax"],
+        "pf": slip["pf"],
+        "net_salary": slip["net_salary"],
+        "slip_date": slip["slip_date"].strftime("%Y-%m-%d"),
+    }
+
+
+def _flattened_jpeg(path):
+    """The image at ``path`` on a white background, as JPEG bytes."""
+    from PIL import Image
+    with Image.open(path) as image:
+        image = image.convert("RGBA")
+    flat = Image.new("RGB", image.size, "white")
+    flat.paste(image, mask=image.getchannel("A"))
+    buffer = io.BytesIO()
+    flat.save(buffer, "JPEG", quality=95)
+    return buffer.getvalue()
+
+
+class PayslipTemplate:
+    """The parts of a payslip that never change, prepared once per process.
+
+    The logo is flattened to a JPEG up front, which reportlab embeds without
+    re-encoding it (encoding the PNG was most of the cost of a slip), and
+    the table style and static labels are built once; rendering a slip then
+    only stamps its values.
+    """
+
+    def __init__(self, logo_path=LOGO_PATH):
+        self.width, self.height = A4
+        self.table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 11),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('LEFTPADDING', (0, 0), (-1, -1), 8),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+        ])
+        self.col_widths = [2.5 * inch, 3.5 * inch]
+        self.labels = ["Payslip ID", "Employee ID", "Employee Name", "Gross Salary",
+                       f"Tax ({TAX_PERCENT}%)", f"PF ({PF_PERCENT}%)", "Net Salary", "Slip Date"]
+
+        self.logo = ImageReader(logo_path) if os.path.exists(logo_path) else None
+        self._logo_jpeg = None
+        if self.logo is not None:
+            try:
+                self._logo_jpeg = _flattened_jpeg(logo_path)
+            except Exception as e:
+                print(f"[WARN] Payslip logo not pre-encoded, drawing it per slip: {e}")
+
+    def _draw_logo(self, c, x, y, width, height):
+        if self._logo_jpeg is None:
+            c.drawImage(self.logo, x, y, width=width, height=height, mask='auto')
+        else:
+            # A JPEG is embedded as is; a reader per slip, as renders run concurrently.
+            c.drawImage(ImageReader(io.BytesIO(self._logo_jpeg)), x, y, width=width, height=height)
+
+    def render(self, slip, out):
+        slip_date = slip["slip_date"]
+        width, height = self.width, self.height
+
+        c = canvas.Canvas(out, pagesize=A4)
+
+        # Company logo and name side-by-side
+        if self.logo is not None:
+            self._draw_logo(c, 40, height - 90, 40, 30)
+
+        c.setFont("Helvetica-Bold", 16)
+        c.drawString(100, height - 75, "STATSCOG Labs PVT LTD")  # Positioned next to logo
+
+        # Bolded slip month and year
+        c.setFont("Helvetica-Bold", 11)
+        c.drawString(40, height - 120, f"Payslip for {slip_date.strftime('%B')}, {slip_date.year}")
+        c.line(40, height - 125, width - 40, height - 125)
+
+        values = [
+            slip["slip_id"],
+            slip["emp_id"],
+            slip["employee_name"],
+            f"{slip['gross_salary']:.2f}",
+            f"{slip['tax']:.2f}",
+            f"{slip['pf']:.2f}",
+            f"{slip['net_salary']:.2f}",
+            slip_date.strftime("%Y-%m-%d"),
+        ]
+        table = Table(list(zip(self.labels, values)), colWidths=self.col_widths)
+        table.setStyle(self.table_style)
+        table.wrapOn(c, width, height)
+        table.drawOn(c, 40, height - 400)
+
+        c.setFont("Helvetica-Oblique", 9)
+        c.drawString(40, 60, "Note: This is an electronically generated payslip and does not require signature.")
+        c.showPage()
+        c.save()
+
+
+_template = None
+
+
+def get_template():
+    global _template
+    if _template is None:
+        _template = PayslipTemplate()
+    return _template
+
+
+def render_payslip_buffer(slip):
+    """Render ``slip`` into a BytesIO positioned at the start, ready to be
+    passed as an upload body."""
+    buffer = io.BytesIO()
+    get_template().render(slip, buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def render_payslip_pdf(slip):
+    return render_payslip_buffer(slip).getvalue()
+
+
+def render_payslip_batch(slips):
+    """Render several slips in one pool task; returns ``[(slip_id, pdf_bytes)]``."""
+    return [(slip["slip_id"], render_payslip_pdf(slip)) for slip in slips]
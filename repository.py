@@ -0,0 +1,119 @@
+"""Hash-indexed views over the COS tables.
+
+A ``Repository`` keeps the rows of one table as dicts, indexed by its id
+column (first occurrence wins, matching the old ``row.iloc[0]`` lookups)
+and optionally grouped by a second column. The indexes are rebuilt only
+when the loader hands back a different DataFrame, i.e. when the table
+cache picked up a new version of the object; inserts and deletes made
+through the repository update them in place. Tables backed by an
+``AppendLog`` pass its ``append`` so inserts write a shard instead of the
+whole table; row-level stores also pass ``remove`` so deletes do not
+rewrite it either.
+"""
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+
+class Repository:
+
+    def __init__(self, load, save, key_column, group_column=None, append=None, remove=None):
+        self._load = load
+        self._save = save
+        self._append = append
+        self._remove = remove
+        self.key_column = key_column
+        self.group_column = group_column
+        self._lock = threading.RLock()
+        self._df = None
+        self._rows = {}
+        self._groups = {}
+        self._writes = 0
+
+    def _rebuild(self, df):
+        rows = {}
+        groups = {}
+        if self.key_column in df.columns:
+            for record in df.to_dict("records"):
+                self._add_to_index(record, rows, groups)
+        self._df = df
+        self._rows = rows
+        self._groups = groups
+
+    def _add_to_index(self, record, rows, groups):
+        key = record.get(self.key_column)
+        if isinstance(key, str):
+            rows.setdefault(key, record)
+        if self.group_column:
+            group = record.get(self.group_column)
+            if isinstance(group, str):
+                groups.setdefault(group, []).append(record)
+
+    @contextmanager
+    def _synced(self):
+        """Hold the lock over an index that is current with the table. The
+        table is loaded before taking the lock, so lookups never wait on a
+        read; a load that raced a write made here is not indexed."""
+        writes = self._writes
+        df = self._load()
+        with self._lock:
+            if df is not self._df and writes == self._writes:
+                self._rebuild(df)
+            yield self._df
+
+    def dataframe(self):
+        with self._synced() as df:
+            return df
+
+    def get(self, key):
+        with self._synced():
+            return self._rows.get(key)
+
+    def get_many(self, keys):
+        """Rows for ``keys`` (None where missing), from one table version."""
+        with self._synced():
+            return [self._rows.get(key) for key in keys]
+
+    def exists(self, key):
+        return self.get(key) is not None
+
+    def by_group(self, group):
+        with self._synced():
+            return list(self._groups.get(group, []))
+
+    def keys(self):
+        with self._synced():
+            return list(self._rows)
+
+    def insert(self, record):
+        with self._synced() as df:
+            self._writes += 1
+            if self._append:
+                df = self._append(record)
+            else:
+                df = pd.concat([df, pd.DataFrame([record])], ignore_index=True)
+                self._save(df)
+            self._df = df
+            self._add_to_index(dict(record), self._rows, self._groups)
+
+    def delete(self, key):
+        with self._synced() as df:
+            if self.key_column not in df.columns:
+                return False
+            self._writes += 1
+            if self._remove:
+                df = self._remove(key)
+            else:
+                df = df[df[self.key_column] != key]
+                self._save(df)
+            self._df = df
+            removed = self._rows.pop(key, None)
+            if removed is not None and self.group_column:
+                group = removed.get(self.group_column)
+                remaining = [r for r in self._groups.get(group, []) if r.get(self.key_column) != key]
+                if remaining:
+                    self._groups[group] = remaining
+                else:
+                    self._groups.pop(group, None)
+            return removed is not None
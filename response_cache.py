@@ -0,0 +1,139 @@
+"""Rendered-page cache with conditional HTTP for the public job board.
+
+``PageCache.cached(version)`` wraps a GET view. Its 200 responses are kept
+per path and query string together with the ``version()`` token they were
+rendered at (e.g. the jobs DataFrame, which only changes when the table
+does). Within ``ttl`` a cached page is served without even asking for the
+version, so a traffic spike costs one table read per worker per ``ttl``;
+after that an unchanged version just refreshes the entry, and a changed one
+re-renders it. Concurrent misses for one page share a single render.
+
+Each page gets an ETag hashed from its body, so every worker hands out the
+same tag for the same page, plus Last-Modified and a public Cache-Control,
+letting browsers and a CDN revalidate and receive 304s. Posting or
+deleting a job calls ``invalidate`` so this worker never serves the old
+list; other workers pick the change up within ``ttl``.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "5"))
+PAGE_MAX_AGE = int(os.getenv("PAGE_MAX_AGE", "30"))
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "1024"))
+
+
+class PageCache:
+
+    def __init__(self, ttl=PAGE_CACHE_TTL, max_age=PAGE_MAX_AGE, max_entries=PAGE_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._render_locks = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "not_modified": 0, "invalidations": 0}
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._render_locks.clear()
+            self._generation += 1
+            self.stats["invalidations"] += 1
+
+    def _fresh(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry["checked"] < self.ttl:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry, None
+            return entry, self._render_locks.setdefault(key, threading.Lock())
+
+    def _lookup(self, key, version, arrived):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["generation"] != self._generation:
+                return None
+            if entry["checked"] >= arrived or entry["version"] is version:
+                # Rendered while we waited, or the table has not changed.
+                if entry["checked"] < arrived:
+                    entry["checked"] = time.monotonic()
+                    self.stats["revalidated"] += 1
+                else:
+                    self.stats["hits"] += 1
+                return entry
+            return None
+
+    def _store(self, key, version, generation, response):
+        body = response.get_data()
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        with self._lock:
+            previous = self._entries.get(key)
+            last_modified = (previous["last_modified"] if previous and previous["etag"] == etag
+                             else datetime.now(timezone.utc).replace(microsecond=0))
+            entry = {"version": version, "generation": generation, "checked": time.monotonic(), "body": body,
+                     "mimetype": response.mimetype, "etag": etag, "last_modified": last_modified}
+            self.stats["misses"] += 1
+            if generation == self._generation:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._render_locks.pop(evicted, None)
+            return entry
+
+    def _release(self, key):
+        """Drop the render lock of a page that was not cached (an error
+        response, or one rendered across an invalidation), so locks are only
+        kept for cached pages."""
+        with self._lock:
+            if key not in self._entries:
+                self._render_locks.pop(key, None)
+
+    def _respond(self, entry):
+        from flask import Response, request
+        response = Response(entry["body"], mimetype=entry["mimetype"])
+        response.set_etag(entry["etag"])
+        response.last_modified = entry["last_modified"]
+        response.cache_control.public = True
+        response.cache_control.max_age = self.max_age
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            with self._lock:
+                self.stats["not_modified"] += 1
+        return response
+
+    def cached(self, version):
+        """Cache a GET view's 200 responses; ``version()`` returns a token
+        that is the same object for as long as the page's data is unchanged."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                from flask import make_response, request
+                if request.method != "GET":
+                    return view(*args, **kwargs)
+                key = request.full_path
+                arrived = time.monotonic()
+                entry, render_lock = self._fresh(key, arrived)
+                if render_lock is not None:
+                    try:
+                        with render_lock:
+                            current = version()
+                            entry = self._lookup(key, current, arrived)
+                            if entry is None:
+                                generation = self._generation
+                                response = make_response(view(*args, **kwargs))
+                                if response.status_code != 200:
+                                    return response
+                                entry = self._store(key, current, generation, response)
+                    finally:
+                        self._release(key)
+                return self._respond(entry)
+            return wrapper
+        return decorator
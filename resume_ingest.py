@@ -0,0 +1,123 @@
+"""Ingestion of resumes submitted through /apply.
+
+``ingest`` runs as the "ingest_resume" background task once the resume is
+stored. It extracts and normalises the text, detects skills and years of
+experience, and stores a compact record as ``resume_records/<form_id>.json``
+next to the form row. The extracted text also seeds the ResumeTextStore
+cache so /resumes/<job_id> never re-parses the file. A route that has just
+uploaded the resume hands its bytes off, so a task run by the same process
+does not download them again. The most recently used records are kept in
+memory, up to ``memory_entries``.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from skills import detect_skills, normalize_text, years_of_experience
+
+HANDOFF_BYTES = int(os.getenv("RESUME_HANDOFF_BYTES", str(32 * 1024 * 1024)))
+
+
+class ResumeIngestor:
+
+    def __init__(self, get_client, bucket, text_store, prefix="resume_records/", memory_entries=2000):
+        self._get_client = get_client
+        self.bucket = bucket
+        self.text_store = text_store
+        self.prefix = prefix
+        self.memory_entries = memory_entries
+        self._records = OrderedDict()
+        self._handoffs = OrderedDict()
+        self._handoff_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"ingested": 0, "failed": 0, "handoffs_used": 0}
+
+    def _remember(self, form_id, record):
+        with self._lock:
+            self._records[form_id] = record
+            self._records.move_to_end(form_id)
+            while len(self._records) > self.memory_entries:
+                self._records.popitem(last=False)
+
+    def record_key(self, form_id):
+        return f"{self.prefix}{form_id}.json"
+
+    def hand_off(self, resume_key, etag, body):
+        """Keep a just-uploaded resume for ``ingest``; the oldest are dropped
+        past RESUME_HANDOFF_BYTES (e.g. when another process ran the task)."""
+        with self._lock:
+            self._handoffs[resume_key] = (etag, body)
+            self._handoff_bytes += len(body)
+            while self._handoff_bytes > HANDOFF_BYTES and self._handoffs:
+                _, (_, dropped) = self._handoffs.popitem(last=False)
+                self._handoff_bytes -= len(dropped)
+
+    def _ingest(self, form_id, job_id, resume_key, etag, body):
+        try:
+            text = normalize_text(self.text_store.parse(resume_key, body))
+            record = {
+                "form_id": form_id,
+                "job_id": job_id,
+                "resume_key": resume_key,
+                "etag": etag,
+                "skills": detect_skills(text),
+                "years_experience": years_of_experience(text),
+                "text": text,
+                "ingested_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            self._get_client().put_object(Bucket=self.bucket, Key=self.record_key(form_id),
+                                          Body=json.dumps(record).encode("utf-8"))
+            if etag:
+                self.text_store.remember(resume_key, etag, text)
+            self._remember(form_id, record)
+            with self._lock:
+                self.stats["ingested"] += 1
+            return record
+        except Exception as e:
+            print(f"[WARN] Resume ingestion failed for {form_id}: {e}")
+            with self._lock:
+                self.stats["failed"] += 1
+            return None
+
+    def recorded_ids(self):
+        """Form ids with a stored record, from a listing of the records."""
+        form_ids = set()
+        token = None
+        while True:
+            params = {"Bucket": self.bucket, "Prefix": self.prefix}
+            if token:
+                params["ContinuationToken"] = token
+            response = self._get_client().list_objects_v2(**params)
+            form_ids.update(obj["Key"][len(self.prefix):-len(".json")] for obj in response.get("Contents", []))
+            if not response.get("IsTruncated"):
+                break
+            token = response["NextContinuationToken"]
+        return form_ids
+
+    def get_record(self, form_id):
+        with self._lock:
+            if form_id in self._records:
+                self._records.move_to_end(form_id)
+                return self._records[form_id]
+        try:
+            response = self._get_client().get_object(Bucket=self.bucket, Key=self.record_key(form_id))
+        except Exception:
+            return None
+        record = json.loads(response["Body"].read())
+        self._remember(form_id, record)
+        return record
+
+    def ingest(self, form_id, job_id, resume_key):
+        """Build the record for a stored resume, from the bytes handed off
+        in this process if there are any, else from COS."""
+        with self._lock:
+            handoff = self._handoffs.pop(resume_key, None)
+            if handoff:
+                self._handoff_bytes -= len(handoff[1])
+                self.stats["handoffs_used"] += 1
+        if handoff is None:
+            response = self._get_client().get_object(Bucket=self.bucket, Key=resume_key)
+            handoff = (response.get("ETag"), response["Body"].read())
+        return self._ingest(form_id, job_id, resume_key, *handoff)
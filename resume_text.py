@@ -0,0 +1,136 @@
+"""Text extraction for uploaded resumes.
+
+PDFs are read with pypdf and DOCX files straight from their
+``word/document.xml``. Extracted text is cached by resume object key and
+ETag, in memory and as ``resume_text/`` objects in COS, so each version of
+a resume is parsed once. Parsing runs in a process pool and downloads in a
+thread pool; ``iter_texts`` yields results as they complete so callers can
+stream them.
+"""
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from xml.etree import ElementTree
+
+FETCH_WORKERS = int(os.getenv("RESUME_FETCH_WORKERS", "16"))
+PARSE_WORKERS = int(os.getenv("RESUME_PARSE_WORKERS", str(os.cpu_count() or 2)))
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def _docx_text(body):
+    with zipfile.ZipFile(io.BytesIO(body)) as archive:
+        root = ElementTree.fromstring(archive.read("word/document.xml"))
+    paragraphs = []
+    for paragraph in root.iter(f"{_WORD_NS}p"):
+        text = "".join(node.text or "" for node in paragraph.iter(f"{_WORD_NS}t"))
+        if text.strip():
+            paragraphs.append(text)
+    return "\n".join(paragraphs)
+
+
+def _pdf_text(body):
+    from pypdf import PdfReader
+    reader = PdfReader(io.BytesIO(body))
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def extract_text(filename, body):
+    """Plain text of a resume, or "" for formats we cannot read (.doc)."""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == ".pdf":
+        text = _pdf_text(body)
+    elif extension == ".docx":
+        text = _docx_text(body)
+    else:
+        return ""
+    return re.sub(r"[ \t]+", " ", text).strip()
+
+
+class ResumeTextStore:
+
+    def __init__(self, get_client, bucket, prefix="resume_text/", memory_entries=2000):
+        self._get_client = get_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._parsers = None
+        self.stats = {"memory_hits": 0, "stored_hits": 0, "parsed": 0, "errors": 0}
+
+    def _parser_pool(self):
+        with self._lock:
+            if self._parsers is None:
+                context = multiprocessing.get_context("forkserver")
+                self._parsers = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=context)
+            return self._parsers
+
+    def _text_key(self, key, etag):
+        digest = hashlib.sha1(f"{key}|{etag}".encode("utf-8")).hexdigest()
+        return f"{self.prefix}{digest}.txt"
+
+    def _remember(self, cache_key, text):
+        with self._lock:
+            self._memory[cache_key] = text
+            self._memory.move_to_end(cache_key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def get_text(self, key, etag=None):
+        """Text of the resume at ``key``. Pass ``etag`` when it is already
+        known to skip the HEAD request."""
+        client = self._get_client()
+        if etag is None:
+            etag = client.head_object(Bucket=self.bucket, Key=key)["ETag"]
+        cache_key = (key, etag)
+        with self._lock:
+            if cache_key in self._memory:
+                self.stats["memory_hits"] += 1
+                self._memory.move_to_end(cache_key)
+                return self._memory[cache_key]
+
+        text_key = self._text_key(key, etag)
+        try:
+            text = client.get_object(Bucket=self.bucket, Key=text_key)["Body"].read().decode("utf-8")
+            self._count("stored_hits")
+        except Exception:
+            body = client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+            text = self.parse(key, body)
+            client.put_object(Bucket=self.bucket, Key=text_key, Body=text.encode("utf-8"))
+            self._count("parsed")
+        self._remember(cache_key, text)
+        return text
+
+    def parse(self, key, body):
+        """Extract text from ``body`` in the parser process pool."""
+        return self._parser_pool().submit(extract_text, key, body).result()
+
+    def remember(self, key, etag, text):
+        """Record text extracted elsewhere (e.g. at upload time)."""
+        self._get_client().put_object(Bucket=self.bucket, Key=self._text_key(key, etag), Body=text.encode("utf-8"))
+        self._remember((key, etag), text)
+
+    def iter_texts(self, items):
+        """Yield ``(name, text)`` for ``items`` of ``(name, key)`` in
+        completion order. Unreadable resumes yield an empty string."""
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as fetchers:
+            futures = {fetchers.submit(self.get_text, key): name for name, key in items}
+            for future in as_completed(futures):
+                try:
+                    text = future.result()
+                except Exception as e:
+                    print(f"⚠️ Error extracting resume for {futures[future]}: {e}")
+                    self._count("errors")
+                    text = ""
+                yield futures[future], text
@@ -0,0 +1,109 @@
+"""In-process BM25 full-text search.
+
+A ``SearchIndex`` is an inverted index from term to ``{doc_id: term
+frequency}`` plus each document's length, so a query only touches the
+postings of its own terms and ranks the matching documents with Okapi
+BM25. Documents are added and removed one at a time as jobs are posted or
+deleted and resumes are ingested; ``sync`` brings the index in line with a
+whole table (e.g. after another worker wrote it) and re-tokenizes only the
+documents whose text changed.
+"""
+import heapq
+import math
+import threading
+
+from skills import tokenize
+
+K1 = 1.2
+B = 0.75
+
+
+class SearchIndex:
+
+    def __init__(self):
+        self._postings = {}
+        self._terms = {}
+        self._lengths = {}
+        self._signatures = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+        self.stats = {"queries": 0, "added": 0, "removed": 0}
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._lengths
+
+    def _remove(self, doc_id):
+        length = self._lengths.pop(doc_id, None)
+        if length is None:
+            return False
+        self._signatures.pop(doc_id, None)
+        self._total_length -= length
+        for term in self._terms.pop(doc_id):
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+        self.stats["removed"] += 1
+        return True
+
+    def _add(self, doc_id, text):
+        self._remove(doc_id)
+        counts = {}
+        tokens = tokenize(text)
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, count in counts.items():
+            self._postings.setdefault(term, {})[doc_id] = count
+        self._terms[doc_id] = tuple(counts)
+        self._lengths[doc_id] = len(tokens)
+        self._signatures[doc_id] = hash(text)
+        self._total_length += len(tokens)
+        self.stats["added"] += 1
+
+    def add(self, doc_id, text):
+        """Index (or re-index) ``doc_id`` with ``text``."""
+        with self._lock:
+            self._add(doc_id, text)
+
+    def remove(self, doc_id):
+        with self._lock:
+            return self._remove(doc_id)
+
+    def sync(self, texts, complete=True):
+        """Index ``texts`` (``{doc_id: text}``), skipping unchanged documents.
+        With ``complete``, documents not in ``texts`` are removed."""
+        with self._lock:
+            if complete:
+                for doc_id in [d for d in self._lengths if d not in texts]:
+                    self._remove(doc_id)
+            for doc_id, text in texts.items():
+                if self._signatures.get(doc_id) != hash(text) or doc_id not in self._lengths:
+                    self._add(doc_id, text)
+
+    def search(self, query, limit=20, offset=0, within=None):
+        """``(results, total)``: the ``limit`` best ``(doc_id, score)`` pairs
+        after ``offset``, best first, and how many documents matched.
+        ``within`` restricts the results to a set of doc ids."""
+        terms = set(tokenize(query))
+        with self._lock:
+            self.stats["queries"] += 1
+            count = len(self._lengths)
+            if not terms or not count:
+                return [], 0
+            average = self._total_length / count or 1
+            scores = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    if within is not None and doc_id not in within:
+                        continue
+                    norm = K1 * (1 - B + B * self._lengths[doc_id] / average)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (K1 + 1) / (frequency + norm)
+        best = heapq.nsmallest(offset + limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return best[offset:], len(scores)
@@ -0,0 +1,95 @@
+"""Skill vocabulary, text normalisation and tokenizing shared by resume
+ingestion, job matching and search."""
+import re
+import unicodedata
+
+# Canonical skill name -> spellings that appear in resumes and JDs.
+SKILLS = {
+    "python": ["python"],
+    "java": ["java"],
+    "c++": ["c++", "cpp"],
+    "javascript": ["javascript", "js"],
+    "typescript": ["typescript"],
+    "react": ["react", "react.js", "reactjs"],
+    "angular": ["angular"],
+    "node.js": ["node.js", "nodejs", "node"],
+    "sql": ["sql", "mysql", "postgresql", "postgres", "sql server"],
+    "nosql": ["nosql", "mongodb", "cassandra"],
+    "machine learning": ["machine learning", "ml"],
+    "deep learning": ["deep learning"],
+    "nlp": ["nlp", "natural language processing"],
+    "computer vision": ["computer vision", "opencv"],
+    "llm": ["llm", "llms", "large language models", "generative ai", "genai"],
+    "rag": ["rag", "retrieval augmented generation"],
+    "data science": ["data science"],
+    "data engineering": ["data engineering", "data pipelines", "etl"],
+    "tensorflow": ["tensorflow"],
+    "pytorch": ["pytorch"],
+    "keras": ["keras"],
+    "scikit-learn": ["scikit-learn", "sklearn"],
+    "pandas": ["pandas"],
+    "numpy": ["numpy"],
+    "spark": ["spark", "pyspark"],
+    "power bi": ["power bi", "powerbi"],
+    "tableau": ["tableau"],
+    "aws": ["aws", "amazon web services", "sagemaker"],
+    "azure": ["azure"],
+    "google cloud": ["google cloud", "gcp"],
+    "ibm cloud": ["ibm cloud", "cloud pak for data"],
+    "watson": ["watson", "watsonx", "watson studio", "watson assistant"],
+    "docker": ["docker", "containerization"],
+    "kubernetes": ["kubernetes", "k8s", "openshift"],
+    "git": ["git", "github", "gitlab"],
+    "flask": ["flask"],
+    "django": ["django"],
+    "fastapi": ["fastapi"],
+    "figma": ["figma"],
+    "ux design": ["ux design", "ui/ux", "user experience"],
+    "agile": ["agile", "scrum"],
+    "chatbot": ["chatbot", "chatbots", "conversational ai"],
+    "pre-sales": ["pre-sales", "presales"],
+    "statistics": ["statistics", "statistical"],
+}
+
+_SKILL_PATTERNS = [
+    (skill, re.compile(r"(?<![\w+#.])(?:" + "|".join(re.escape(a) for a in aliases) + r")(?![\w+#])"))
+    for skill, aliases in SKILLS.items()
+]
+_YEARS_PATTERN = re.compile(r"(\d{1,2}(?:\.\d)?)\s*\+?\s*(?:-\s*\d{1,2}\s*)?(?:years?|yrs?)", re.IGNORECASE)
+_BULLETS = re.compile(r"[•●▪■◦‣*]+")
+_SPACES = re.compile(r"[ \t\r\f\v]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+# Keeps "c++", "c#" and "node.js" whole.
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]")
+_STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on",
+    "or", "our", "the", "to", "we", "will", "with", "you", "your", "this", "that", "have", "has",
+}
+
+
+def normalize_text(text):
+    """NFKC-normalise, drop bullet glyphs and collapse whitespace."""
+    text = unicodedata.normalize("NFKC", text or "")
+    text = _BULLETS.sub(" ", text)
+    text = _SPACES.sub(" ", text)
+    text = "\n".join(line.strip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+def tokenize(text):
+    """Lower-cased word tokens without stop words."""
+    text = (text or "").lower().replace("\\n", " ")
+    return [t for t in _TOKEN.findall(text) if t not in _STOP_WORDS]
+
+
+def detect_skills(text):
+    lowered = (text or "").lower()
+    return [skill for skill, pattern in _SKILL_PATTERNS if pattern.search(lowered)]
+
+
+def years_of_experience(text):
+    """Largest "N years" figure mentioned, which in a resume is usually the
+    total experience; None when there is none."""
+    years = [float(m.group(1)) for m in _YEARS_PATTERN.finditer(text or "")]
+    years = [y for y in years if y <= 50]
+    return max(years) if years else None
@@ -0,0 +1,345 @@
+"""Embedded SQLite backend for the four tables (``TABLE_BACKEND=sqlite``).
+
+Each table lives in one WAL-mode SQLite file on the node, indexed on its id
+column and the column it is grouped by, so every gunicorn worker reads it
+locally and row inserts/deletes are single transactions instead of a
+read-modify-write of the whole COS object. A ``_tables`` row per table
+holds a version bumped by every write; readers keep the parsed DataFrame
+in memory and only re-read it when the version moved, so a read costs one
+indexed lookup and returns the same DataFrame object (which is what
+``Repository`` and ``SortedView`` key their indexes on).
+
+Durability comes from COS: after a write, a background thread takes a
+consistent online backup of the database every ``SQLITE_SNAPSHOT_INTERVAL``
+seconds and uploads it to ``SQLITE_SNAPSHOT_KEY``, and a node that starts
+without a database file restores it from there (starting empty only if
+there is no snapshot; any other error fails the start). Writes made since the last
+snapshot are lost if the node's disk is. ``flask migrate-sqlite`` loads the
+existing CSV tables.
+"""
+import atexit
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_KEY = os.getenv("SQLITE_SNAPSHOT_KEY", "snapshots/tables.db")
+SNAPSHOT_INTERVAL = float(os.getenv("SQLITE_SNAPSHOT_INTERVAL", "30"))
+
+# Version of a table that has not been read yet (None is a table never written).
+_UNREAD = object()
+
+
+def _is_missing(error):
+    return (getattr(error, "response", None) or {}).get("Error", {}).get("Code") in ("NoSuchKey", "404")
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _to_sql_value(value):
+    if value is None:
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, datetime):
+        if (value.hour, value.minute, value.second, value.microsecond) == (0, 0, 0, 0):
+            return value.strftime("%Y-%m-%d")
+        return value.isoformat(sep=" ")
+    if value is pd.NA or value is pd.NaT:
+        return None
+    return value
+
+
+class SQLiteTable:
+    """One table in a ``TableStore``; reads like an ``AppendLog``."""
+
+    def __init__(self, store, key, key_column, index_columns=()):
+        self._store = store
+        self.key = key
+        self.name = os.path.splitext(key)[0]
+        self.key_column = key_column
+        self.index_columns = (key_column,) + tuple(index_columns)
+        self._lock = threading.Lock()
+        self._version = _UNREAD
+        self._df = None
+        self._projections = {}
+
+    def _columns(self, conn):
+        return [row[1] for row in conn.execute(f"PRAGMA table_info({_quote(self.name)})")]
+
+    def _ensure_columns(self, conn, columns):
+        existing = self._columns(conn)
+        if not existing:
+            conn.execute(f"CREATE TABLE {_quote(self.name)} ({', '.join(_quote(c) for c in columns)})")
+            existing = list(columns)
+        else:
+            for column in columns:
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE {_quote(self.name)} ADD COLUMN {_quote(column)}")
+                    existing.append(column)
+        for column in self.index_columns:
+            if column in existing:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {_quote(f'{self.name}_{column}')} "
+                             f"ON {_quote(self.name)} ({_quote(column)})")
+
+    def _insert(self, conn, columns, rows):
+        placeholders = ", ".join("?" for _ in columns)
+        conn.executemany(
+            f"INSERT INTO {_quote(self.name)} ({', '.join(_quote(c) for c in columns)}) VALUES ({placeholders})",
+            rows)
+
+    def read(self, columns=None):
+        """The whole table (or just ``columns``), as the same DataFrame
+        object for as long as the table is unchanged."""
+        conn = self._store.connection()
+        version = self._store.version(conn, self.name)
+        with self._lock:
+            if self._version is _UNREAD or version != self._version:
+                self._store.count("reloads")
+                if version is None or not self._columns(conn):
+                    df = pd.DataFrame()
+                else:
+                    df = pd.read_sql_query(f"SELECT * FROM {_quote(self.name)} ORDER BY rowid", conn)
+                self._version, self._df, self._projections = version, df, {}
+            else:
+                self._store.count("hits")
+            if not columns:
+                return self._df
+            columns = tuple(c for c in columns if c in self._df.columns)
+            if columns not in self._projections:
+                self._projections[columns] = self._df[list(columns)]
+            return self._projections[columns]
+
+    def _apply(self, write, update):
+        """Run ``write(conn)`` in a write transaction, then bring the cached
+        DataFrame forward with ``update(df)`` if nobody else wrote since it
+        was read (otherwise, or without ``update``, the next read reloads it)."""
+        with self._store.transaction() as conn:
+            before = self._store.version(conn, self.name)
+            write(conn)
+            self._store.bump(conn, self.name)
+        with self._lock:
+            if update is None:
+                self._version = _UNREAD
+            elif self._version == before and self._df is not None:
+                self._version, self._df, self._projections = (before or 0) + 1, update(self._df), {}
+        self._store.wrote()
+        return self.read()
+
+    def append(self, record):
+        """Insert ``record`` and return the updated table."""
+        return self.append_many([record])
+
+    def append_many(self, records):
+        """Insert ``records`` in one transaction and return the updated table."""
+        columns = list(dict.fromkeys(c for record in records for c in record))
+        rows = [tuple(_to_sql_value(record.get(c)) for c in columns) for record in records]
+
+        def write(conn):
+            self._ensure_columns(conn, columns)
+            self._insert(conn, columns, rows)
+
+        def update(df):
+            added = pd.DataFrame(rows, columns=columns)
+            return added if df.empty else pd.concat([df, added], ignore_index=True)
+
+        return self._apply(write, update)
+
+    def remove(self, key):
+        """Delete the rows with id ``key`` and return the updated table."""
+        def write(conn):
+            if self.key_column in self._columns(conn):
+                conn.execute(f"DELETE FROM {_quote(self.name)} WHERE {_quote(self.key_column)} = ?", (key,))
+
+        def update(df):
+            if self.key_column not in df.columns:
+                return df
+            return df[df[self.key_column] != key].reset_index(drop=True)
+
+        return self._apply(write, update)
+
+    def replace(self, df):
+        """Atomically replace the table's contents (and columns) with ``df``."""
+        columns = [str(c) for c in df.columns]
+        rows = [tuple(_to_sql_value(v) for v in row) for row in df.itertuples(index=False, name=None)]
+
+        def write(conn):
+            conn.execute(f"DROP TABLE IF EXISTS {_quote(self.name)}")
+            if columns:
+                self._ensure_columns(conn, columns)
+                self._insert(conn, columns, rows)
+
+        # Re-read rather than trust df's dtypes, so readers see what SQLite returns.
+        return self._apply(write, None)
+
+
+class TableStore:
+
+    def __init__(self, path, get_client=None, bucket=None, snapshot_key=SNAPSHOT_KEY,
+                 snapshot_interval=SNAPSHOT_INTERVAL):
+        self.path = path
+        self._get_client = get_client
+        self.bucket = bucket
+        self.snapshot_key = snapshot_key
+        self.snapshot_interval = snapshot_interval
+        self._tables = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._ready_pid = None
+        self._snapshotter = None
+        self.stats = {"hits": 0, "reloads": 0, "writes": 0, "snapshots": 0, "snapshot_errors": 0, "restores": 0}
+
+    def table(self, key, key_column=None, index_columns=()):
+        """The table stored under ``key``; registers it on the first call."""
+        if key not in self._tables:
+            self._tables[key] = SQLiteTable(self, key, key_column, index_columns)
+        return self._tables[key]
+
+    def _prepare(self):
+        # Once per process: restore from COS if the node has no database yet.
+        with self._lock:
+            if self._ready_pid == os.getpid():
+                return
+            if not os.path.exists(self.path):
+                self._restore()
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("CREATE TABLE IF NOT EXISTS _tables (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+                conn.execute("CREATE TABLE IF NOT EXISTS _meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            finally:
+                conn.close()
+            self._ready_pid = os.getpid()
+
+    def connection(self):
+        """This thread's connection (a fresh one after a fork)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            self._prepare()
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def transaction(self):
+        return _Transaction(self.connection())
+
+    @staticmethod
+    def version(conn, name):
+        row = conn.execute("SELECT version FROM _tables WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def bump(conn, name):
+        conn.execute("INSERT INTO _tables (name, version) VALUES (?, 1) "
+                     "ON CONFLICT(name) DO UPDATE SET version = version + 1", (name,))
+
+    def count(self, event):
+        with self._stats_lock:
+            self.stats[event] += 1
+
+    def wrote(self):
+        self.count("writes")
+        with self._lock:
+            if self._get_client and self.snapshot_interval > 0 and (
+                    self._snapshotter is None or not self._snapshotter.is_alive()):
+                self._snapshotter = threading.Thread(target=self._snapshot_loop, name="sqlite-snapshot", daemon=True)
+                self._snapshotter.start()
+
+    def _snapshot_loop(self):
+        while True:
+            time.sleep(self.snapshot_interval)
+            self.snapshot()
+
+    def snapshot(self, force=False):
+        """Upload a consistent copy of the database to COS if any worker
+        wrote since the last upload. Returns True if one was uploaded."""
+        if not self._get_client:
+            return False
+        with self.transaction() as conn:
+            written = conn.execute("SELECT COALESCE(SUM(version), 0) FROM _tables").fetchone()[0]
+            row = conn.execute("SELECT value FROM _meta WHERE key = 'snapshot'").fetchone()
+            if row and row[0] == written and not force:
+                return False
+            # Claimed inside the write lock so only one worker uploads.
+            conn.execute("INSERT OR REPLACE INTO _meta (key, value) VALUES ('snapshot', ?)", (written,))
+        try:
+            fd, tmp = tempfile.mkstemp(suffix=".db", dir=os.path.dirname(os.path.abspath(self.path)))
+            os.close(fd)
+            try:
+                target = sqlite3.connect(tmp)
+                try:
+                    self.connection().backup(target)
+                finally:
+                    target.close()
+                with open(tmp, "rb") as f:
+                    self._get_client().put_object(Bucket=self.bucket, Key=self.snapshot_key, Body=f.read())
+            finally:
+                os.remove(tmp)
+        except Exception as e:
+            print(f"⚠️ SQLite snapshot to {self.snapshot_key} failed: {e}")
+            self.count("snapshot_errors")
+            with self.transaction() as conn:
+                conn.execute("DELETE FROM _meta WHERE key = 'snapshot'")
+            return False
+        self.count("snapshots")
+        return True
+
+    def flush(self):
+        """Snapshot pending writes now (e.g. at shutdown)."""
+        try:
+            if self._ready_pid == os.getpid():
+                self.snapshot()
+        except Exception as e:
+            print(f"⚠️ SQLite snapshot at exit failed: {e}")
+
+    def _restore(self):
+        if not self._get_client:
+            return
+        try:
+            body = self._get_client().get_object(Bucket=self.bucket, Key=self.snapshot_key)["Body"].read()
+        except Exception as e:
+            if not _is_missing(e):
+                # Starting empty would overwrite the snapshot on the first write.
+                raise
+            print(f"[WARN] No SQLite snapshot restored from {self.snapshot_key}: {e}")
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.restore"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, self.path)
+        self.count("restores")
+        print(f"Restored {self.path} from {self.snapshot_key} ({len(body)} bytes)")
+
+
+class _Transaction:
+    """``BEGIN IMMEDIATE`` ... ``COMMIT``, rolled back on error."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def create_table_store(data_folder, get_client=None, bucket=None):
+    path = os.getenv("SQLITE_TABLES_DB", os.path.join(data_folder, "tables.db"))
+    store = TableStore(path, get_client, bucket)
+    atexit.register(store.flush)
+    return store
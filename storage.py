@@ -0,0 +1,156 @@
+"""COS client construction and concurrent object I/O.
+
+``create_client`` builds the one ibm_boto3 client the app shares, with a
+connection pool sized for the request, payroll and ingestion threads that
+use it and botocore's standard retry mode (exponential backoff with jitter
+on throttling, 5xx and connection errors). ``COS_BACKEND=local`` swaps in
+``local_cos.LocalCOS``, a filesystem stand-in for tests and benchmarks.
+
+``Storage`` adds a shared thread pool so independent gets/puts in a
+request run concurrently, and routes large uploads through the managed
+transfer so they go up as concurrent multipart parts.
+
+COS only signs presigned URLs with HMAC credentials, so
+``create_presign_client`` builds a second, SigV4 client from
+``COS_HMAC_ACCESS_KEY_ID``/``COS_HMAC_SECRET_ACCESS_KEY``; without them
+direct browser uploads are disabled.
+"""
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+COS_BACKEND = os.getenv("COS_BACKEND", "ibm")
+MAX_ATTEMPTS = int(os.getenv("COS_MAX_ATTEMPTS", "5"))
+RETRY_MODE = os.getenv("COS_RETRY_MODE", "standard")
+CONNECT_TIMEOUT = float(os.getenv("COS_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("COS_READ_TIMEOUT", "60"))
+IO_WORKERS = int(os.getenv("COS_IO_WORKERS", "16"))
+# Enough connections for every gthread request thread plus the I/O pool.
+MAX_POOL_CONNECTIONS = int(os.getenv("COS_MAX_POOL_CONNECTIONS",
+                                     str(max(64, int(os.getenv("GUNICORN_THREADS", "64")) + IO_WORKERS))))
+MULTIPART_THRESHOLD = int(os.getenv("COS_MULTIPART_THRESHOLD", str(8 * 1024 * 1024)))
+MULTIPART_CHUNKSIZE = int(os.getenv("COS_MULTIPART_CHUNKSIZE", str(8 * 1024 * 1024)))
+MULTIPART_CONCURRENCY = int(os.getenv("COS_MULTIPART_CONCURRENCY", "8"))
+HMAC_ACCESS_KEY_ID = os.getenv("COS_HMAC_ACCESS_KEY_ID")
+HMAC_SECRET_ACCESS_KEY = os.getenv("COS_HMAC_SECRET_ACCESS_KEY")
+COS_REGION = os.getenv("COS_REGION")
+PRESIGN_EXPIRES = int(os.getenv("COS_PRESIGN_EXPIRES", "900"))
+PRESIGN_ENABLED = COS_BACKEND != "local" and bool(HMAC_ACCESS_KEY_ID and HMAC_SECRET_ACCESS_KEY)
+
+
+def create_client(endpoint=None, api_key_id=None, instance_crn=None):
+    if COS_BACKEND == "local":
+        from local_cos import LocalCOS
+        return LocalCOS(os.getenv("COS_LOCAL_DIR", ".local_cos"), latency=float(os.getenv("COS_LOCAL_LATENCY", "0")))
+
+    import ibm_boto3
+    from ibm_botocore.client import Config
+
+    return ibm_boto3.client("s3",
+        ibm_api_key_id=api_key_id,
+        ibm_service_instance_id=instance_crn,
+        config=Config(
+            signature_version="oauth",
+            max_pool_connections=MAX_POOL_CONNECTIONS,
+            connect_timeout=CONNECT_TIMEOUT,
+            read_timeout=READ_TIMEOUT,
+            tcp_keepalive=True,
+            retries={"max_attempts": MAX_ATTEMPTS, "mode": RETRY_MODE}
+        ),
+        endpoint_url=endpoint
+    )
+
+
+def create_presign_client(endpoint=None):
+    """SigV4 client for presigned URLs (needs ``PRESIGN_ENABLED``)."""
+    import ibm_boto3
+    from ibm_botocore.client import Config
+
+    return ibm_boto3.client("s3",
+        aws_access_key_id=HMAC_ACCESS_KEY_ID,
+        aws_secret_access_key=HMAC_SECRET_ACCESS_KEY,
+        region_name=COS_REGION,
+        config=Config(signature_version="s3v4"),
+        endpoint_url=endpoint
+    )
+
+
+class LazyClient:
+    """Proxy that builds its client on first attribute access."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        client = self._client
+        if client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+                client = self._client
+        return getattr(client, name)
+
+    def reset(self):
+        """Drop the client (and its connection pool), e.g. after a fork."""
+        with self._lock:
+            self._client = None
+
+
+def transfer_config():
+    from ibm_boto3.s3.transfer import TransferConfig
+    return TransferConfig(
+        multipart_threshold=MULTIPART_THRESHOLD,
+        multipart_chunksize=MULTIPART_CHUNKSIZE,
+        max_concurrency=MULTIPART_CONCURRENCY
+    )
+
+
+class Storage:
+
+    def __init__(self, client, bucket, workers=IO_WORKERS, presign_client=None):
+        self.client = client
+        self.bucket = bucket
+        self.presign_client = presign_client
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cos-io")
+
+    def submit(self, fn, *args, **kwargs):
+        """Run ``fn`` on the I/O pool and return its Future."""
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def get(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def put(self, key, body):
+        """Store ``body`` and return its ETag."""
+        return self.client.put_object(Bucket=self.bucket, Key=key, Body=body).get("ETag")
+
+    def presigned_put(self, key, content_type, size, expires=PRESIGN_EXPIRES):
+        """URL a browser can PUT exactly ``size`` bytes of ``content_type``
+        to, or None when presigning is not configured."""
+        if self.presign_client is None:
+            return None
+        return self.presign_client.generate_presigned_url("put_object", ExpiresIn=expires, Params={
+            "Bucket": self.bucket, "Key": key, "ContentType": content_type, "ContentLength": size
+        })
+
+    def head(self, key):
+        return self.client.head_object(Bucket=self.bucket, Key=key)
+
+    def get_range(self, key, start, end):
+        """Bytes ``start``..``end`` (inclusive) of an object."""
+        response = self.client.get_object(Bucket=self.bucket, Key=key, Range=f"bytes={start}-{end}")
+        return response["Body"].read()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def upload(self, key, body):
+        """Store ``body`` (bytes), as concurrent multipart parts when it is
+        over the multipart threshold, and return its ETag."""
+        if len(body) < MULTIPART_THRESHOLD or not hasattr(self.client, "upload_fileobj"):
+            return self.put(key, body)
+        self.client.upload_fileobj(io.BytesIO(body), self.bucket, key, Config=transfer_config())
+        return self.client.head_object(Bucket=self.bucket, Key=key).get("ETag")
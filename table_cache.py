@@ -0,0 +1,135 @@
+"""In-process cache of the parsed COS tables.
+
+Each entry keeps the parsed DataFrame together with the ETag it was read
+at. Reads within the TTL are served from memory; after that the entry is
+revalidated with a conditional GET so an unchanged object costs a 304
+instead of a full download and re-parse. Writes go through the cache so
+the worker that saved a table never has to read it back. Concurrent misses
+for one key share a single fetch: callers that arrive while it is in
+flight wait for its result instead of queueing for fetches of their own.
+"""
+import os
+import threading
+import time
+
+
+class NotModified(Exception):
+    pass
+
+
+class _Fetch:
+    """One in-flight fetch and its outcome, shared by the callers waiting on it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.df = None
+        self.error = None
+
+
+class TableCache:
+
+    def __init__(self, ttl=0):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._fetches = {}
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "revalidations": 0,
+            "not_modified": 0,
+            "writes": 0,
+            "errors": 0,
+            "coalesced": 0,
+        }
+
+    def get(self, key, fetch):
+        """Return the cached table for ``key``.
+
+        ``fetch(key, etag)`` must return ``(df, etag)`` or raise
+        ``NotModified`` when the stored object still matches ``etag``.
+        The returned DataFrame is shared; callers must not mutate it in place.
+        """
+        arrived = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and arrived - entry["checked"] < self.ttl:
+                self.stats["hits"] += 1
+                return entry["df"]
+            flight = self._fetches.get(key)
+            if flight is None:
+                flight = self._fetches[key] = _Fetch()
+                leader = True
+            else:
+                self.stats["coalesced"] += 1
+                leader = False
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.df
+        try:
+            flight.df = self._fetch(key, entry, fetch)
+            return flight.df
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._fetches[key]
+            flight.done.set()
+
+    def _fetch(self, key, entry, fetch):
+        etag = entry["etag"] if entry else None
+        try:
+            df, new_etag = fetch(key, etag)
+        except NotModified:
+            with self._lock:
+                self.stats["revalidations"] += 1
+                self.stats["not_modified"] += 1
+                current = self._entries.get(key)
+                if current is not entry:
+                    # Written (or dropped) through ``put`` while the fetch was in flight.
+                    return current["df"] if current else entry["df"]
+                entry["checked"] = time.monotonic()
+            return entry["df"]
+        except Exception as e:
+            with self._lock:
+                self.stats["errors"] += 1
+            if entry:
+                print(f"⚠️ Serving stale {key} after error: {e}")
+                return entry["df"]
+            raise
+
+        with self._lock:
+            if entry:
+                self.stats["revalidations"] += 1
+            else:
+                self.stats["misses"] += 1
+            current = self._entries.get(key)
+            if current is not entry:
+                # Written (or dropped) through ``put`` while the fetch was in flight.
+                return current["df"] if current else df
+            self._entries[key] = {"df": df, "etag": new_etag, "checked": time.monotonic()}
+        return df
+
+    def put(self, key, df, etag):
+        with self._lock:
+            self.stats["writes"] += 1
+            for projected in [k for k in self._entries if k.startswith(key + "|")]:
+                del self._entries[projected]
+            self._entries[key] = {"df": df, "etag": etag, "checked": time.monotonic()}
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = {
+                key: {"etag": entry["etag"], "rows": len(entry["df"])}
+                for key, entry in self._entries.items()
+            }
+        stats["ttl"] = self.ttl
+        return stats
+
+
+table_cache = TableCache(ttl=float(os.getenv("TABLE_CACHE_TTL", "0")))
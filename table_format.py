@@ -0,0 +1,77 @@
+"""Serialisation formats for the data_source tables.
+
+``TABLE_FORMAT=csv`` (the default) keeps the existing ``*.csv`` objects.
+``TABLE_FORMAT=parquet`` stores each table as ``<name>.parquet`` instead;
+Parquet is compressed and typed, and reads can decode only the requested
+columns. pyarrow is only needed in Parquet mode.
+"""
+import io
+import os
+from datetime import datetime
+
+import pandas as pd
+
+
+class CsvFormat:
+    name = "csv"
+    extension = ".csv"
+
+    def decode(self, body, columns=None):
+        text = body.decode("utf-8-sig")
+        if columns:
+            return pd.read_csv(io.StringIO(text), usecols=lambda c: c in columns)
+        return pd.read_csv(io.StringIO(text))
+
+    def encode(self, df):
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False)
+        return buffer.getvalue().encode("utf-8")
+
+
+class ParquetFormat:
+    name = "parquet"
+    extension = ".parquet"
+
+    def decode(self, body, columns=None):
+        if columns:
+            import pyarrow.parquet as pq
+            available = pq.read_schema(io.BytesIO(body)).names
+            columns = [c for c in columns if c in available]
+        return pd.read_parquet(io.BytesIO(body), columns=columns or None)
+
+    def encode(self, df):
+        buffer = io.BytesIO()
+        _stringify_objects(df).to_parquet(buffer, index=False)
+        return buffer.getvalue()
+
+
+def _stringify_objects(df):
+    # Rows inserted at runtime carry Timestamps while rows read back from
+    # storage carry strings; Parquet needs one type per column.
+    df = df.copy()
+    for column in df.columns[df.dtypes == object]:
+        df[column] = df[column].map(_to_text)
+    return df
+
+
+def _to_text(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, datetime):
+        if (value.hour, value.minute, value.second, value.microsecond) == (0, 0, 0, 0):
+            return value.strftime("%Y-%m-%d")
+        return value.isoformat(sep=" ")
+    return str(value)
+
+
+FORMATS = {f.name: f for f in (CsvFormat(), ParquetFormat())}
+
+
+def get_format(name=None):
+    return FORMATS[(name or os.getenv("TABLE_FORMAT", "csv")).lower()]
+
+
+def storage_key(key, table_format):
+    """Object key for a logical ``*.csv`` table name in ``table_format``."""
+    stem, _ = os.path.splitext(key)
+    return stem + table_format.extension
@@ -0,0 +1,316 @@
+"""Background tasks and periodic jobs, queued in SQLite.
+
+Handlers are registered by name and a task is a row in a SQLite queue
+shared by every gunicorn worker on the node, so a handler can ``enqueue``
+work, respond, and let clients follow it through ``status``. Queued tasks
+survive restarts. Each process runs ``workers`` threads that claim the
+most urgent due task (lowest ``priority``, then oldest) with ``BEGIN
+IMMEDIATE`` and hold it under a lease; a task whose worker died is queued
+again once its lease runs out. A task that raises is retried after
+``backoff ** attempts`` seconds, up to ``max_attempts``.
+
+``every`` declares periodic jobs. A shared job (log compaction) runs once
+per interval on the node: the process that claims the tick in the
+``schedule`` table enqueues it. A local job (warming this process's
+caches) runs in every process, first as soon as its workers start.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from metrics import registry as metrics
+
+TASK_WORKERS = int(os.getenv("TASK_WORKERS", "4"))
+TASK_POLL_SECONDS = float(os.getenv("TASK_POLL_SECONDS", "1"))
+TASK_LEASE_SECONDS = float(os.getenv("TASK_LEASE_SECONDS", "300"))
+TASK_HISTORY_SECONDS = float(os.getenv("TASK_HISTORY_SECONDS", str(7 * 24 * 3600)))
+
+HIGH, NORMAL, LOW = 0, 5, 9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    unique_key TEXT,
+    enqueued_at REAL NOT NULL,
+    run_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    lease_until REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_due ON tasks (status, priority, run_at);
+CREATE UNIQUE INDEX IF NOT EXISTS tasks_unique ON tasks (unique_key)
+    WHERE unique_key IS NOT NULL AND status IN ('queued', 'running');
+CREATE TABLE IF NOT EXISTS schedule (name TEXT PRIMARY KEY, next_run REAL NOT NULL);
+"""
+
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat(timespec="seconds") if timestamp else None
+
+
+class TaskQueue:
+
+    def __init__(self, path, workers=TASK_WORKERS, poll=TASK_POLL_SECONDS, history=TASK_HISTORY_SECONDS):
+        self.path = path
+        self.workers = workers
+        self.poll = poll
+        self.history = history
+        self._handlers = {}
+        self._periodic = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._started_pid = None
+        self.stats = {"enqueued": 0, "completed": 0, "retried": 0, "failed": 0, "lost": 0, "periodic": 0}
+
+    def _connection(self):
+        """This thread's connection (a fresh one after a fork)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _count(self, event, name):
+        with self._lock:
+            self.stats[event] += 1
+        metrics.inc("tasks_total", task=name, event=event)
+
+    def register(self, name, fn, max_attempts=3, backoff=2.0, lease=TASK_LEASE_SECONDS, fatal=()):
+        """Run ``fn(**payload)`` for tasks called ``name``. What it returns
+        (JSON-serialisable) becomes the task's result; exceptions in
+        ``fatal`` fail the task without retrying."""
+        self._handlers[name] = {"fn": fn, "max_attempts": max_attempts, "backoff": backoff,
+                                "lease": lease, "fatal": tuple(fatal)}
+        return fn
+
+    def every(self, name, seconds, payload=None, shared=True, priority=LOW):
+        """Run task ``name`` every ``seconds`` (0: once, when a process starts
+        its workers; only for local jobs)."""
+        self._periodic.append({"name": name, "seconds": seconds, "payload": payload or {},
+                               "shared": shared, "priority": priority})
+
+    def enqueue(self, name, payload=None, priority=NORMAL, delay=0, unique_key=None):
+        """Queue a task and return its id. While a task with ``unique_key``
+        is queued or running, the same key returns that task's id instead."""
+        return self.enqueue_many(name, [payload or {}], priority, delay, unique_key)[0]
+
+    def enqueue_many(self, name, payloads, priority=NORMAL, delay=0, unique_key=None):
+        """Queue one task per payload in a single transaction."""
+        handler = self._handlers[name]
+        now = time.time()
+        task_ids = []
+        with self._transaction() as conn:
+            if unique_key:
+                row = conn.execute("SELECT task_id FROM tasks WHERE unique_key = ? AND status IN ('queued', 'running')",
+                                   (unique_key,)).fetchone()
+                if row:
+                    return [row["task_id"]]
+            for payload in payloads:
+                task_ids.append(uuid.uuid4().hex[:12])
+                conn.execute(
+                    "INSERT INTO tasks (task_id, name, payload, priority, status, max_attempts, unique_key, "
+                    "enqueued_at, run_at) VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+                    (task_ids[-1], name, json.dumps(payload), priority, handler["max_attempts"], unique_key,
+                     now, now + delay))
+        for _ in task_ids:
+            self._count("enqueued", name)
+        self._wake.set()
+        return task_ids
+
+    def status(self, task_id):
+        row = self._connection().execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "task_id": row["task_id"],
+            "name": row["name"],
+            "status": row["status"],
+            "priority": row["priority"],
+            "attempts": row["attempts"],
+            "max_attempts": row["max_attempts"],
+            "enqueued_at": _iso(row["enqueued_at"]),
+            "run_at": _iso(row["run_at"]) if row["status"] == "queued" else None,
+            "started_at": _iso(row["started_at"]),
+            "finished_at": _iso(row["finished_at"]),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+        }
+
+    def counts(self, name):
+        """Tasks named ``name`` by status, over the kept history."""
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM tasks WHERE name = ? GROUP BY status",
+                                          (name,)).fetchall()
+        return dict.fromkeys(("queued", "running", "completed", "failed"), 0) | dict(rows)
+
+    def _claim(self):
+        now = time.time()
+        conn = self._connection()
+        # Only take the write lock when something is due.
+        if conn.execute("SELECT 1 FROM tasks WHERE (status = 'queued' AND run_at <= ?) "
+                        "OR (status = 'running' AND lease_until < ?) LIMIT 1", (now, now)).fetchone() is None:
+            return None
+        names = list(self._handlers)
+        with self._transaction() as conn:
+            lost = [row["name"] for row in conn.execute(
+                "SELECT name FROM tasks WHERE status = 'running' AND lease_until < ?", (now,))]
+            conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END, "
+                "finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE ? END, "
+                "lease_until = NULL, error = 'Worker stopped before finishing' "
+                "WHERE status = 'running' AND lease_until < ?", (now, now))
+            row = conn.execute(
+                f"SELECT * FROM tasks WHERE status = 'queued' AND run_at <= ? "
+                f"AND name IN ({', '.join('?' * len(names))}) ORDER BY priority, run_at LIMIT 1",
+                (now, *names)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE tasks SET status = 'running', attempts = attempts + 1, started_at = ?, "
+                             "lease_until = ? WHERE task_id = ?",
+                             (now, now + self._handlers[row["name"]]["lease"], row["task_id"]))
+        for name in lost:
+            self._count("lost", name)
+        return dict(row, attempts=row["attempts"] + 1) if row is not None else None
+
+    def _finish(self, task_id, **fields):
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._transaction() as conn:
+            # A task reclaimed after its lease ran out belongs to its new worker.
+            conn.execute(f"UPDATE tasks SET {assignments}, lease_until = NULL "
+                         f"WHERE task_id = ? AND status = 'running'", (*fields.values(), task_id))
+
+    def _run(self, name, payload):
+        with metrics.span("task_run_seconds", task=name):
+            return self._handlers[name]["fn"](**payload)
+
+    def _execute(self, task):
+        name, handler = task["name"], self._handlers[task["name"]]
+        metrics.observe("task_queue_seconds", max(0.0, time.time() - task["run_at"]), task=name)
+        try:
+            result = json.dumps(self._run(name, json.loads(task["payload"])), default=str)
+        except Exception as e:
+            if task["attempts"] < task["max_attempts"] and not isinstance(e, handler["fatal"]):
+                self._finish(task["task_id"], status="queued", error=str(e),
+                             run_at=time.time() + handler["backoff"] ** task["attempts"])
+                self._count("retried", name)
+            else:
+                print(f"[WARN] Task {task['task_id']} ({name}) failed: {e}")
+                self._finish(task["task_id"], status="failed", error=str(e), finished_at=time.time())
+                self._count("failed", name)
+            return
+        self._finish(task["task_id"], status="completed", result=result, error=None, finished_at=time.time())
+        self._count("completed", name)
+
+    def _work(self):
+        while True:
+            try:
+                task = self._claim()
+            except Exception as e:
+                print(f"[WARN] Task queue unavailable: {e}")
+                task = None
+            if task is None:
+                self._wake.wait(self.poll)
+                self._wake.clear()
+                continue
+            try:
+                self._execute(task)
+            except Exception as e:
+                print(f"[WARN] Task {task['task_id']} could not be updated: {e}")
+
+    def _tick(self, job, now):
+        """Claim this interval of a shared job for this process."""
+        conn = self._connection()
+        row = conn.execute("SELECT next_run FROM schedule WHERE name = ?", (job["name"],)).fetchone()
+        if row is not None and row["next_run"] > now:
+            return False
+        with self._transaction() as conn:
+            row = conn.execute("SELECT next_run FROM schedule WHERE name = ?", (job["name"],)).fetchone()
+            if row is not None and row["next_run"] > now:
+                return False
+            conn.execute("INSERT OR REPLACE INTO schedule (name, next_run) VALUES (?, ?)",
+                         (job["name"], now + job["seconds"]))
+            return True
+
+    def _schedule(self):
+        next_local = {job["name"]: 0 for job in self._periodic if not job["shared"]}
+        next_prune = 0
+        while True:
+            now = time.time()
+            for job in self._periodic:
+                try:
+                    if job["shared"]:
+                        if job["seconds"] and self._tick(job, now):
+                            self.enqueue(job["name"], job["payload"], job["priority"], unique_key=f"every:{job['name']}")
+                            self._count("periodic", job["name"])
+                    elif now >= next_local[job["name"]]:
+                        next_local[job["name"]] = now + job["seconds"] if job["seconds"] else float("inf")
+                        self._count("periodic", job["name"])
+                        self._run(job["name"], job["payload"])
+                except Exception as e:
+                    print(f"[WARN] Periodic job {job['name']} failed: {e}")
+            if now >= next_prune:
+                next_prune = now + 3600
+                try:
+                    with self._transaction() as conn:
+                        conn.execute("DELETE FROM tasks WHERE status IN ('completed', 'failed') AND finished_at < ?",
+                                     (now - self.history,))
+                except Exception as e:
+                    print(f"[WARN] Task history not pruned: {e}")
+            time.sleep(self.poll)
+
+    def start(self):
+        """Start this process's workers and scheduler; safe to call on every request."""
+        if self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            self._wake = threading.Event()
+            for i in range(self.workers):
+                threading.Thread(target=self._work, name=f"task-worker-{i}", daemon=True).start()
+            if self._periodic:
+                threading.Thread(target=self._schedule, name="task-scheduler", daemon=True).start()
+
+    def snapshot(self):
+        """This process's counters plus node-wide queue depth and the age of
+        the oldest due task."""
+        now = time.time()
+        conn = self._connection()
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM tasks WHERE status IN ('queued', 'running') "
+                                   "GROUP BY status").fetchall())
+        oldest = conn.execute("SELECT MIN(run_at) FROM tasks WHERE status = 'queued' AND run_at <= ?",
+                              (now,)).fetchone()[0]
+        with self._lock:
+            stats = dict(self.stats)
+        stats["queued"] = counts.get("queued", 0)
+        stats["running"] = counts.get("running", 0)
+        stats["oldest_due_seconds"] = round(now - oldest, 3) if oldest else 0.0
+        return stats